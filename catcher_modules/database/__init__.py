@@ -1,10 +1,14 @@
+import asyncio
 import csv
-import datetime
+import hashlib
 import json
 import os
+import re
+import time
 from abc import abstractmethod
-from io import StringIO
-from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from itertools import islice
 from os.path import join
 from typing import List
 
@@ -12,12 +16,21 @@ from catcher.utils.file_utils import read_file
 from catcher.utils.logger import debug
 from catcher.utils.misc import fill_template_str, try_get_objects
 
+from catcher_modules.exceptions.data_exceptions import DataMismatchException, SchemaMismatchException
+from catcher_modules.utils import async_utils
+from catcher_modules.utils import cache_utils
+from catcher_modules.utils import coercion_utils
+from catcher_modules.utils import dataset_utils
 from catcher_modules.utils import db_utils
 from catcher_modules.utils import generator_utils
+from catcher_modules.utils.compare_utils import MultisetDiff
+from catcher_modules.utils import reflection_utils
+from catcher_modules.utils import schema_utils
+from catcher_modules.utils import sql_utils
 
-
-class EmptyRow:
-    pass
+DDL_PATTERN = re.compile(r'^\s*(create|alter|drop|rename)\s', re.IGNORECASE | re.MULTILINE)
+# max number of rows checked by a single flags query: every row is a column of its result
+MAX_FLAGS = 1000
 
 
 class SqlAlchemyDb:
@@ -27,21 +40,62 @@ class SqlAlchemyDb:
     def dialect(self) -> str:
         pass
 
-    @abstractmethod
-    def table_info(self, table_name):
-        pass
+    @property
+    def max_binds(self) -> int:
+        """
+        Max number of bind parameters in a single query. Default is the smallest one: 999 on old sqlite.
+        """
+        return 999
+
+    @property
+    def parallel_populate(self) -> bool:
+        """
+        Can multiple tables be populated at the same time.
+        """
+        return True
 
     def execute(self, body: dict, variables: dict):
         in_data = body['request']
         conf = in_data['conf']
+        if 'snapshot' in in_data:
+            return self.snapshot(conf, in_data['snapshot'])
+        if 'restore' in in_data:
+            return self.restore(conf, in_data['restore'])
         sql = in_data.get('sql', in_data.get('query'))
         if sql is None:
             raise Exception('Either sql or query param is required')
-        if sql.endswith('.sql'):
-            sql = fill_template_str(read_file(join(variables['RESOURCES_DIR'], sql)), variables)
-        return self.__execute(conf, sql)
+        params = in_data.get('params')
+        if isinstance(sql, list):  # independent queries, which are run concurrently by the async engine
+            queries = [SqlAlchemyDb.__read_sql(query, variables) for query in sql]
+            if db_utils.is_async(conf):
+                return async_utils.run(self.__execute_all_async(conf, queries, params))
+            return [self.__execute(conf, query, params) for query in queries]
+        sql = SqlAlchemyDb.__read_sql(sql, variables)
+        if in_data.get('script', False):
+            return self.__execute_script(conf, sql)
+        if any(option in in_data for option in ['limit', 'sample', 'to_file']):
+            return self.__execute_streaming(conf, sql, variables, in_data.get('limit'), in_data.get('sample'),
+                                            in_data.get('to_file'), params)
+        if db_utils.is_async(conf):
+            return async_utils.run(self.__execute_async(conf, sql, params))
+        return self.__execute(conf, sql, params)
+
+    def snapshot(self, conf, name: str):
+        """
+        Save the current state of the database under the name, so it can be restored later.
+        Override it in dialects, which support snapshots.
+        """
+        raise Exception('Snapshots are not supported for ' + self.dialect)
 
-    def populate(self, variables, conf=None, schema=None, data: dict = None, use_json=False, **kwargs):
+    def restore(self, conf, name: str):
+        """
+        Restore the database to the state saved by snapshot.
+        Override it in dialects, which support snapshots.
+        """
+        raise Exception('Snapshots are not supported for ' + self.dialect)
+
+    def populate(self, variables, conf=None, schema=None, data: dict = None, use_json=False, batch_size=10000,
+                 workers=4, cache=False, script=False, **kwargs):
         """
         :Input:  Populate database with prepared scripts (DDL or CSV with data).
 
@@ -55,12 +109,30 @@ class SqlAlchemyDb:
         - password: user's password
         - port: database port
 
-        :schema: path to the schema file. *Optional*
+        :schema: path to the schema file. Tables metadata is reflected once per run and is reflected again
+                 only after the schema file (or any other ddl) is executed by catcher. *Optional*
+
+        :data: dictionary with keys = tables and values - paths to csv files with data. Parquet (.parquet) and Arrow
+               IPC/Feather (.arrow, .feather, .ipc) files are also supported. They are typed, so no type conversion
+               is needed and they are loaded much faster. Pyarrow is required for them. *Optional*
 
-        :data: dictionary with keys = tables and values - paths to csv files with data. *Optional*
+        :script: split the schema file into statements and run them one by one, see `script` of the sql step.
+                 Is needed for multi-statement schemas on drivers, which accept only one statement per call (sqlite).
+                 *Optional*, default is false.
 
         :use_json: try to recognize json strings and convert them to json. *Optional*, default is false.
 
+        :batch_size: number of csv rows inserted at once. *Optional*, default is 10000.
+
+        :workers: number of tables populated at the same time. Tables are populated after the tables they reference
+                  via foreign keys. *Optional*, default is 4.
+
+        :cache: skip the schema and the tables, which were already populated with the same content. Fingerprints of
+                the schema and data files (with templates filled) and row counts are stored in the
+                `catcher_populate_cache` table of the database. Changed tables (and tables referencing them) are
+                cleaned and populated again. If the schema is changed - everything is populated again.
+                *Optional*, default is false.
+
         :F.e.:
         populate postgres
         ::
@@ -80,15 +152,47 @@ class SqlAlchemyDb:
 
         """
         resources = variables['RESOURCES_DIR']
+        engine = self.get_engine(conf)
+        cached = cache_utils.load(engine) if cache else {}
         if schema is not None:
             with open(os.path.join(resources, schema)) as fd:
                 ddl_sql = fill_template_str(fd.read(), variables)
-                self.__execute(conf, ddl_sql)
+            fingerprint = cache_utils.fingerprint_text(ddl_sql)
+            if cache and cached.get(cache_utils.SCHEMA_KEY, (None,))[0] == fingerprint:
+                debug('Schema {} is not changed, skipping'.format(schema))
+            else:
+                if script:
+                    self.__execute_script(conf, ddl_sql)
+                else:
+                    self.__execute(conf, ddl_sql)
+                reflection_utils.invalidate(engine, ddl_sql)
+                if cache:  # tables could be recreated, populate everything again
+                    cached = {}
+                    cache_utils.save(engine, {cache_utils.SCHEMA_KEY: (fingerprint, 0)}, replace_all=True)
         if data is not None and data:
-            for table_name, path_to_csv in data.items():
-                self.__populate_csv(conf, table_name, os.path.join(resources, path_to_csv), variables, use_json)
-
-    def expect(self, variables, conf=None, schema=None, data: dict = None, strict=False, **kwargs):
+            if not self.parallel_populate:
+                workers = 1
+            paths = {table_name: os.path.join(resources, path) for table_name, path in data.items()}
+            levels = self.__populate_order(engine, list(data.keys()))
+            fingerprints = {}
+            if cache:
+                fingerprints = {table_name: cache_utils.fingerprint_file(path, variables, {'use_json': use_json})
+                                for table_name, path in paths.items()}
+                levels = self.__clean_changed(engine, levels, fingerprints, cached)
+            populated = {}
+            for tables in levels:
+                with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tables)))) as executor:
+                    futures = {table_name: executor.submit(self.__populate_table, conf, table_name,
+                                                           paths[table_name], variables, use_json, batch_size)
+                               for table_name in tables}
+                    for table_name, future in futures.items():
+                        populated[table_name] = future.result()
+            if cache:
+                cache_utils.save(engine, {table_name: (fingerprints[table_name], count)
+                                          for table_name, count in populated.items()})
+
+    def expect(self, variables, conf=None, schema=None, data: dict = None, strict=False, checksum: dict = None,
+               **kwargs):
         """
         :Input: Check database schema and data.
 
@@ -102,13 +206,23 @@ class SqlAlchemyDb:
         - password: user's password
         - port: database port
 
-        :schema: path to the schema file. *Optional*
+        :schema: path to the json file with expected tables: their columns with types and primary keys. Type's
+                 arguments are checked only if set: `varchar` matches any `varchar(n)`. All the differences are
+                 reported at once. *Optional*
 
         :data: dictionary with keys = tables and values - paths to csv files with data.
-               Jinja2 templates supported. *Optional*
+               Jinja2 templates supported. Parquet and Arrow IPC/Feather files are also supported. *Optional*
+
+        :strict: Strictly check the data. Will pass only if no other data exists in the table. Rows order
+         doesn't matter. *Optional* (default is false)
+
+        :checksum: Strictly check the data by comparing checksums, calculated in the database, with checksums of the
+         csv. Table is split into chunks by integer key column, only chunks with different checksums are
+         compared row by row. Is much faster for huge tables. Currently supported only by Postgres, other
+         databases fall back to the strict check. *Optional*
 
-        :strict: Strictly check the data. Will pass only if no other data exists and the data is in the
-         same order, as in the csv. *Optional* (default is false)
+        - key: integer column to split the table into chunks. Must be in csv. **Required**
+        - chunk_size: range of key values in a single chunk. *Optional* (default is 100000)
 
         :F.e.:
         `schema`
@@ -148,147 +262,395 @@ class SqlAlchemyDb:
         if schema is not None:
             self.__check_schema(conf, os.path.join(resources, schema))
         if data is not None:
-            for table_name, path_to_csv in data.items():
-                csv_file = os.path.join(resources, path_to_csv)
-                csv_stream = self.__read_n_fill_csv(csv_file, variables)
-                if strict:
-                    self._check_data_strict(conf, table_name, csv_stream)
+            for table_name, path_to_data in data.items():
+                data_file = os.path.join(resources, path_to_data)
+                keys, rows = self.__read_data(data_file, variables)
+                if not keys:
+                    raise Exception('No header in ' + path_to_data)
+                if checksum is not None:
+                    self._check_data_checksum(conf, table_name, keys, rows,
+                                              lambda: self.__read_data(data_file, variables)[1], **checksum)
+                elif strict:
+                    self._check_data_strict(conf, table_name, keys, rows)
                 else:
-                    self._check_data(conf, table_name, csv_stream)
+                    self._check_data(conf, table_name, keys, rows)
 
     def get_engine(self, conf):
         return db_utils.get_engine(conf, self.dialect)
 
-    def __populate_csv(self, conf, table_name, path_to_csv, variables, use_json):
-        csv_reader = csv.reader(self.__read_n_fill_csv(path_to_csv, variables), delimiter=',')
-        line_count = 0
+    def __populate_table(self, conf, table_name, path_to_data, variables, use_json, batch_size):
+        names, rows = self.__read_data(path_to_data, variables)
+        typed = dataset_utils.is_columnar(path_to_data)
         engine = self.get_engine(conf)
+        table = reflection_utils.get_table(engine, table_name)
+        plan = coercion_utils.coercion_plan([table.c[name] for name in names])
+        started = time.perf_counter()
+        total = 0
+        with engine.begin() as connection:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                if not typed:  # columnar files already have proper types, no need to convert
+                    if use_json:
+                        batch = [[try_get_objects(r) for r in row] for row in batch]
+                    batch = coercion_utils.coerce_rows(plan, batch)
+                self._insert_batch(connection, table, names, batch)
+                total += len(batch)
+        spent = time.perf_counter() - started
+        debug('Populated {} rows into {} in {:.2f}s ({:.0f} rows/sec)'.format(total, table_name, spent,
+                                                                           total / spent if spent else total))
+        return total
 
-        row_table = self.__automap_table(table_name, engine)
-        from sqlalchemy.orm import Session
-        session = Session(engine)
-        names = None
-        for row in csv_reader:
-            if line_count == 0:
-                names = [r.strip() for r in row]
-                line_count += 1
-            else:
-                if use_json:
-                    row = [try_get_objects(r) for r in row]
-                session.add(self.__create_row(row_table, dict(zip(names, row))))
-        session.commit()
+    @staticmethod
+    def __clean_changed(engine, levels: List[List[str]], fingerprints: dict, cached: dict) -> List[List[str]]:
+        """
+        Find tables, which content differs from the cached one, and delete all their rows.
+        Tables, which reference changed tables, are cleaned as well - their rows could reference deleted ones.
+
+        :return: populate levels with changed tables only.
+        """
+        from sqlalchemy import func, select
+        changed = {}  # table name -> table
+        with engine.begin() as connection:
+            for level in levels:
+                for table_name in level:
+                    table = reflection_utils.get_table(engine, table_name)
+                    references_changed = any(fk.column.table.fullname in [t.fullname for t in changed.values()]
+                                             for fk in table.foreign_keys)
+                    if table_name in cached and cached[table_name][0] == fingerprints[table_name] \
+                            and not references_changed \
+                            and connection.execute(select(func.count()).select_from(table)).scalar() \
+                            == cached[table_name][1]:
+                        debug('{} is not changed, skipping'.format(table_name))
+                        continue
+                    changed[table_name] = table
+            for level in reversed(levels):  # delete rows referencing other tables first
+                for table_name in reversed(level):
+                    if table_name in changed:
+                        connection.execute(changed[table_name].delete())
+        levels = [[table_name for table_name in level if table_name in changed] for level in levels]
+        return [level for level in levels if level]
+
+    @staticmethod
+    def __populate_order(engine, table_names: List[str]) -> List[List[str]]:
+        """
+        Group tables in levels. Every table references (via foreign keys) only tables from the previous levels,
+        so all tables of the same level can be populated in parallel.
+        """
+        depends_on = {}
+        for table_name in table_names:
+            table = reflection_utils.get_table(engine, table_name)
+            depends_on[table_name] = {name for name in table_names
+                                      if name != table_name and
+                                      any(fk.column.table.fullname == reflection_utils.get_table(engine, name).fullname
+                                          for fk in table.foreign_keys)}
+        levels = []
+        while depends_on:
+            level = [name for name in table_names if name in depends_on and not depends_on[name]]
+            if not level:  # circular dependencies. Populate them one by one in the original order
+                debug('Circular foreign keys between {}'.format(list(depends_on.keys())))
+                levels += [[name] for name in table_names if name in depends_on]
+                break
+            for name in level:
+                del depends_on[name]
+            for dependencies in depends_on.values():
+                dependencies.difference_update(level)
+            levels += [level]
+        return levels
+
+    def _insert_batch(self, connection, table, names: List[str], rows: List[tuple]):
+        """
+        Insert a batch of rows in a single executemany call.
+        Override it in case the dialect has a faster way of loading the data.
+
+        :param names: column names.
+        :param rows: rows as tuples of values in the order of the names.
+        """
+        connection.execute(table.insert(), [dict(zip(names, row)) for row in rows])
 
     def __check_schema(self, conf, schema_file):
-        # TODO implement me
+        """
+        Check tables described in the schema file. All the tables of a database schema are loaded with a single
+        catalog query, which is cached until the schema is changed by catcher.
+        """
+        engine = self.get_engine(conf)
         with open(schema_file) as fd:
-            data = json.load(fd)
-            for table, meta in data.items():
-                info = self.table_info(table)
-        return True
+            expected = json.load(fd)
+        diff = {}
+        for table_name, meta in expected.items():
+            schema, name = table_name.split('.') if '.' in table_name else (None, table_name)
+            catalog = reflection_utils.get_catalog(engine, schema, self._load_catalog)
+            for kind, differences in schema_utils.compare_schema(table_name, meta, catalog.get(name.lower())).items():
+                diff.setdefault(kind, []).extend(differences)
+        if diff:
+            raise SchemaMismatchException(diff)
+
+    def _load_catalog(self, engine, schema: str or None) -> dict:
+        """
+        Load columns and primary keys of all the tables of the schema with a single information_schema query.
+        Override it in case the dialect has no information_schema.
 
-    def _check_data(self, conf, table_name, csv_stream):
-        iter_csv = iter(generator_utils.csv_to_generator(csv_stream))
-        keys = next(iter_csv)
+        :param schema: schema name or None for the default one.
+        :return: catalog, see schema_utils.build_catalog.
+        """
+        from sqlalchemy import inspect, text
+        schema = schema or inspect(engine).default_schema_name
+        with engine.connect() as connection:
+            rows = connection.execute(text(schema_utils.INFORMATION_SCHEMA_QUERY), {'schema': schema})
+            return schema_utils.build_catalog(rows)
 
+    def _check_data(self, conf, table_name, keys: List[str], rows):
+        """
+        Check all the expected rows are in the table. Rows are checked in chunks: one query per chunk, which
+        returns a found/not found flag for every row of the chunk.
+        """
         engine = self.get_engine(conf)
-        row_table = self.__automap_table(table_name, engine)
-        from sqlalchemy.orm import Session
-        session = Session(engine)
-        has_error = False
-        try:
-            for row in iter_csv:
-                found = session.query(row_table).filter_by(**dict(zip(keys, row))).first()
-                if found is None:
-                    debug('No ' + str(row) + ' found')
-                    has_error = True
-            if has_error:
-                raise Exception('Data check failed')
-        finally:
-            session.close()
-
-    def _check_data_strict(self, conf, table_name, csv_stream):
-        engine = self.get_engine(conf)
-        csv_generator = generator_utils.csv_to_generator(csv_stream)
-        keys = next(iter(csv_generator))
-        db_generator = generator_utils.table_to_generator(table_name, engine)
-        sentinel = EmptyRow()
-        res = all(self.compare_result_set(keys, a, b)
-                  for a, b in zip_longest(csv_generator, db_generator, fillvalue=sentinel))
-        if not res:
-            raise Exception('Data check failed')
-
-    def __execute(self, conf: str, query: str):
-        engine = self.get_engine(conf)
+        table = reflection_utils.get_table(engine, table_name)
+        chunk_size = self._check_chunk_size(keys)
+        missing = []
         with engine.connect() as connection:
-            res = connection.execute(query)
-            if res.returns_rows:
-                result = [dict(r) for r in res]
-                return result[0] if len(result) == 1 else result
-            else:
-                return res.rowcount
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                missing += [dict(zip(keys, row)) for row in self._find_missing(connection, table, keys, chunk)]
+        if missing:
+            debug('Missing in {}: {}'.format(table_name, missing))
+            raise DataMismatchException(table_name, missing=missing)
+
+    def _check_chunk_size(self, keys: List[str]) -> int:
+        """
+        Number of expected rows checked by a single query of `_find_missing`.
+        """
+        # every value is bound twice, every row is a column of the result
+        return max(1, min(MAX_FLAGS, self.max_binds // (2 * len(keys))))
 
-    @classmethod
-    def __automap_table(cls, table_name: str, engine):
-        from sqlalchemy.ext.automap import automap_base
+    def _find_missing(self, connection, table, keys: List[str], rows: List[list]) -> List[list]:
+        """
+        Find the rows, which are not in the table, with a single query. It returns a found/not found flag for
+        every row. Override it in case the dialect supports anti-join with VALUES.
+        """
+        from sqlalchemy import select, and_, or_, case, func
+        conditions = [and_(*[table.c[k] == v for k, v in zip(keys, row)]) for row in rows]
+        flags = [func.max(case((condition, 1), else_=0)) for condition in conditions]
+        found = connection.execute(select(*flags).where(or_(*conditions))).first()
+        if found is None:
+            return rows
+        return [row for row, flag in zip(rows, found) if flag != 1]
+
+    def _check_data_strict(self, conf, table_name, keys: List[str], rows):
+        """
+        Check the table contains exactly the expected rows (in any order). Both expected rows and the table are
+        streamed and compared by hashes of their rows, so memory doesn't depend on the table size.
+        """
+        engine = self.get_engine(conf)
+        table = self.__get_table_with_columns(engine, table_name, keys)
+        self.__diff_rows(engine, table, keys, rows)
 
-        schema = None
-        if '.' in table_name:
-            [schema, table_name] = table_name.split('.')
+    def _check_data_checksum(self, conf, table_name, keys: List[str], rows, rows_factory, key: str,
+                             chunk_size: int = 100000):
+        """
+        Compare checksums of key ranges, calculated in the database, with the ones calculated from the expected rows.
+        Only the ranges with different checksums are compared row by row.
 
-        debug('Mapping {}. It can take a while'.format(table_name))
-        Base = automap_base()
-        Base.prepare(engine, reflect=True, schema=schema)
+        :param rows_factory: function, which returns expected rows once again, for comparing row by row.
+        """
+        if key not in keys:
+            raise Exception('Checksum key ' + key + ' should be in csv')
+        key_index = keys.index(key)
+        engine = self.get_engine(conf)
+        table = self.__get_table_with_columns(engine, table_name, keys)
+        expected = {}
+        for row in rows:
+            chunk = SqlAlchemyDb.__key_chunk(row[key_index], chunk_size)
+            count, total = expected.get(chunk, (0, 0))
+            expected[chunk] = (count + 1, total + self.row_checksum(self.__as_text(row)))
         try:
-            return Base.classes[table_name]
-        except KeyError:
-            raise Exception('Can\'t map table without primary key.')
+            with engine.connect() as connection:
+                actual = self._table_checksums(connection, table, keys, key, chunk_size)
+        except NotImplementedError:
+            debug('Checksums are not supported for {}. Will compare all rows'.format(self.dialect))
+            return self._check_data_strict(conf, table_name, keys, rows_factory())
+        differ = {chunk for chunk in set(expected) | set(actual) if expected.get(chunk) != actual.get(chunk)}
+        if not differ:
+            return
+        debug('{} of {} chunks differ in {}'.format(len(differ), len(set(expected) | set(actual)), table_name))
+        from sqlalchemy import or_, and_
+        column = table.c[key]
+        where = or_(*[column.is_(None) if chunk is None else
+                      and_(column >= chunk * chunk_size, column < (chunk + 1) * chunk_size) for chunk in differ])
+        self.__diff_rows(engine, table, keys,
+                         (row for row in rows_factory()
+                          if SqlAlchemyDb.__key_chunk(row[key_index], chunk_size) in differ),
+                         where)
 
-    @classmethod
-    def __read_n_fill_csv(cls, csv_path, variables):
-        with open(csv_path) as csv_file:
-            csv_content = fill_template_str(csv_file.read(), variables).replace('\n\n', '\n')
-        return StringIO(csv_content)
+    @staticmethod
+    def __key_chunk(value, chunk_size: int) -> int or None:
+        """
+        Chunk of the key's value. All the rows with null key are in the None chunk.
+        """
+        if value is None or value == '':
+            return None
+        return int(value) // chunk_size
+
+    def _table_checksums(self, connection, table, keys: List[str], key: str, chunk_size: int) -> dict:
+        """
+        Calculate checksums of the table in the database.
+        Override it in case the dialect can calculate `row_checksum` on the server side.
+
+        :return: dict, where key is `key // chunk_size` (None for null keys) and value is a tuple of rows count
+                 and sum of their checksums.
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def row_checksum(values: List[str]) -> int:
+        """
+        Checksum of the row's text representation: first 60 bits of md5 of the values, joined with the unit
+        separator character (0x1f).
+        """
+        return int(hashlib.md5('\x1f'.join(values).encode('utf-8')).hexdigest()[:15], 16)
+
+    @staticmethod
+    def __get_table_with_columns(engine, table_name: str, keys: List[str]):
+        table = reflection_utils.get_table(engine, table_name)
+        for key in keys:
+            if key not in table.c:
+                raise Exception('No ' + key + ' found in ' + table_name)
+        return table
 
     @staticmethod
-    def compare_result_set(keys: List[str], values: List[str], db_row):
-        if isinstance(values, EmptyRow):
-            if hasattr(db_row, '__dict__'):
-                debug('Got more data than expected: ' +
-                      str({key: value for (key, value) in db_row.__dict__.items() if key != '_sa_instance_state'}))
+    def __diff_rows(engine, table, keys: List[str], expected_rows, where=None):
+        diff = MultisetDiff()
+        for row in expected_rows:
+            diff.add_expected(SqlAlchemyDb.__as_text(row))
+        from sqlalchemy import select, column
+        query = select(*[column(k) for k in keys]).select_from(table)  # untyped columns - raw values from driver
+        if where is not None:
+            query = query.where(where)
+        for row in generator_utils.query_to_generator(query, engine):
+            diff.add_actual(SqlAlchemyDb.__as_text(row))
+        missing, extra = diff.diff()
+        if missing or extra:
+            debug('Data mismatch in {}. Missing: {}, extra: {}'.format(table.fullname, missing, extra))
+            raise DataMismatchException(table.fullname,
+                                        missing=[{'row': dict(zip(keys, row)), 'count': c} for row, c in missing],
+                                        extra=[{'row': dict(zip(keys, row)), 'count': c} for row, c in extra])
+
+    @staticmethod
+    def __as_text(row) -> tuple:
+        """
+        Text representation of the row, which is used to compare rows from different sources.
+        """
+        return tuple('' if value is None else str(value) for value in row)
+
+    def __execute(self, conf: str, query: str, params: dict or list = None):
+        """
+        :param params: bind parameters. If set - query is executed as sqlalchemy text with `:name` placeholders,
+                       so the driver can reuse the prepared statement. List of dicts is executed with executemany.
+        """
+        from sqlalchemy import text
+        engine = self.get_engine(conf)
+        with engine.connect() as connection:
+            if params is None:
+                res = connection.execute(query)
             else:
-                debug('Got more data than expected: {}'.format(db_row))
-            return False
-        expected = dict(zip(keys, values))
-        if isinstance(db_row, EmptyRow):
-            debug('Missing data: ' + str(expected))
-            return False
-        for key, value in expected.items():
-            if not hasattr(db_row, key):
-                if hasattr(db_row, '__dict__'):
-                    debug('No ' + str(key) + ' found in ' +
-                          str({key: value for (key, value) in db_row.__dict__.items() if key != '_sa_instance_state'}))
-                else:
-                    debug('No ' + str(key) + ' found in {}'.format(db_row))
-                return False
-            if str(getattr(db_row, key)) != value:
-                debug('Value mismatch for ' + str(key) + ': got '
-                      + str(getattr(db_row, key)) + ', expect: ' + str(value))
-                return False
-        return True
+                res = connection.execute(text(query), params)
+            if DDL_PATTERN.search(query):
+                reflection_utils.invalidate(engine)
+            return SqlAlchemyDb.__to_output(res)
+
+    async def __execute_async(self, conf: dict, query: str, params: dict or list = None):
+        """
+        Execute the query with the async engine in its own transaction.
+        """
+        from sqlalchemy import text
+        engine = db_utils.get_async_engine(conf, self.dialect)
+        async with engine.begin() as connection:
+            if params is None:
+                res = await connection.exec_driver_sql(query)
+            else:
+                res = await connection.execute(text(query), params)
+            result = SqlAlchemyDb.__to_output(res)
+        if DDL_PATTERN.search(query):
+            reflection_utils.invalidate(self.get_engine(conf))
+        return result
+
+    async def __execute_all_async(self, conf: dict, queries: List[str], params: dict or list = None) -> list:
+        """
+        Execute all the queries concurrently, each in its own connection.
+        """
+        return list(await asyncio.gather(*[self.__execute_async(conf, query, params) for query in queries]))
+
+    @staticmethod
+    def __to_output(res):
+        if res.returns_rows:
+            result = [dict(r) for r in res]
+            return result[0] if len(result) == 1 else result
+        return res.rowcount
 
     @staticmethod
-    def __create_row(row_table, raw_data: dict):
-        """
-        Need to check field types before creating a row.
-        """
-        import arrow
-        for key, value in raw_data.items():
-            desired_type = getattr(row_table, key).property.columns[0].type.python_type
-            if not isinstance(value, desired_type):
-                if desired_type == datetime.datetime and value:
-                    raw_data[key] = arrow.get(value).datetime
-                elif desired_type == datetime.date and value:
-                    raw_data[key] = arrow.get(value).date
+    def __read_sql(sql: str, variables: dict) -> str:
+        if sql.endswith('.sql'):
+            return fill_template_str(read_file(join(variables['RESOURCES_DIR'], sql)), variables)
+        return sql
+
+    def __execute_script(self, conf: str, script: str) -> List[dict]:
+        """
+        Split the script into statements and run them one by one in a single transaction.
+
+        :return: result of every statement: its text, rowcount, time spent in seconds and rows (if it returns any).
+        """
+        engine = self.get_engine(conf)
+        statements = sql_utils.split_statements(script, self.dialect)
+        results = []
+        with engine.begin() as connection:
+            for statement in statements:
+                started = time.perf_counter()
+                res = connection.exec_driver_sql(statement)
+                result = {'statement': statement}
+                if res.returns_rows:
+                    result['rows'] = [dict(r) for r in res]
+                    result['rowcount'] = len(result['rows'])
                 else:
-                    raw_data[key] = desired_type(value) if value else None
-        return row_table(**raw_data)
+                    result['rowcount'] = res.rowcount
+                result['time'] = time.perf_counter() - started
+                debug('{:.3f}s, {} rows: {}'.format(result['time'], result['rowcount'], statement))
+                results += [result]
+        if any(DDL_PATTERN.search(statement) for statement in statements):
+            reflection_utils.invalidate(engine)
+        return results
+
+    def __execute_streaming(self, conf: str, query: str, variables: dict, limit: int = None, sample: int = None,
+                            to_file: str = None, params: dict = None):
+        """
+        Stream query results with a server side cursor, without loading all of them into memory.
+        """
+        with closing(generator_utils.query_to_generator(query, self.get_engine(conf), params)) as results:
+            rows = (dict(r) for r in results)
+            if limit is not None:
+                rows = islice(rows, int(limit))
+            if sample is not None:
+                rows = dataset_utils.sample_rows(rows, int(sample))
+            if to_file is not None:
+                path = join(variables['RESOURCES_DIR'], to_file)
+                count = dataset_utils.write_rows(path, rows)
+                debug('{} rows saved to {}'.format(count, path))
+                return {'path': to_file, 'count': count}
+            return list(rows)
+
+    @staticmethod
+    def __read_data(path: str, variables: dict):
+        """
+        Read data file: csv (templates are filled) or columnar (parquet/arrow).
+
+        :return: column names and iterator over rows.
+        """
+        if dataset_utils.is_columnar(path):
+            return dataset_utils.read_columnar_rows(path)
+        rows = filter(None, csv.reader(generator_utils.file_to_generator(path, variables)))
+        header = next(rows, None)
+        if header is None:
+            return [], iter([])
+        return [name.strip() for name in header], rows
@@ -1,3 +1,5 @@
+from typing import List
+
 from catcher.steps.external_step import ExternalStep
 from catcher.steps.step import update_variables
 from catcher_modules.utils import db_utils
@@ -21,7 +23,16 @@ class MSSql(ExternalStep, SqlAlchemyDb):
               catcher-modules Dockerfile will be used.
 
     :query: query to run. **Deprecated since 5.2**
-    :sql: query or sql file from resources to run. **Required**
+    :sql: query or sql file from resources to run. Can be a list of them, the output is a list of results.
+          **Required**
+    :limit: return only first N rows of the result. *Optional*
+    :sample: return N random rows of the result. *Optional*
+    :to_file: save the result to this file in resources instead of returning it. Format is selected by extension:
+              csv, jsonl or parquet (pyarrow is required). Output is {path: <file>, count: <rows saved>}. *Optional*
+    :script: split sql into statements and run them one by one in a single transaction. Output is a list with
+             every statement's `statement`, `rowcount`, `time` in seconds and `rows` (if it returns any). *Optional*
+    :params: bind parameters for `:name` placeholders in sql: a dictionary or a list of dictionaries, which is
+             executed as a batch. Statement is not changed between calls, so its prepared plan can be reused. *Optional*
 
     :Examples:
 
@@ -65,6 +76,10 @@ class MSSql(ExternalStep, SqlAlchemyDb):
     def dialect(self) -> str:
         return "mssql+pyodbc"
 
+    @property
+    def max_binds(self) -> int:
+        return 2000
+
     def get_engine(self, conf):
         if isinstance(conf, dict):
             driver = 'ODBC Driver 17 for SQL Server' if 'driver' not in conf else conf['driver']
@@ -72,6 +87,18 @@ class MSSql(ExternalStep, SqlAlchemyDb):
             driver = None
         return db_utils.get_engine(conf, self.dialect, driver)
 
+    def _insert_batch(self, connection, table, names: List[str], rows: List[tuple]):
+        """
+        Use pyodbc fast_executemany, which sends the whole batch as a parameter array.
+        """
+        cursor = connection.connection.cursor()
+        if not hasattr(cursor, 'fast_executemany'):  # pymssql
+            return super()._insert_batch(connection, table, names, rows)
+        compiled = table.insert().compile(dialect=connection.dialect, column_keys=names)
+        cursor.fast_executemany = True
+        positions = [names.index(n) for n in compiled.positiontup]
+        cursor.executemany(str(compiled), [tuple(row[i] for i in positions) for row in rows])
+
     @update_variables
     def action(self, includes: dict, variables: dict) -> any:
         body = self.simple_input(variables)
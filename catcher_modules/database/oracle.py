@@ -2,6 +2,7 @@ from catcher.steps.external_step import ExternalStep
 from catcher.steps.step import update_variables
 
 from catcher_modules.database import SqlAlchemyDb
+from catcher_modules.utils import schema_utils
 
 
 class Oracle(ExternalStep, SqlAlchemyDb):
@@ -19,7 +20,16 @@ class Oracle(ExternalStep, SqlAlchemyDb):
     - port: database port
 
     :query: query to run. **Deprecated since 5.2**
-    :sql: query or sql file from resources to run. **Required**
+    :sql: query or sql file from resources to run. Can be a list of them, the output is a list of results.
+          **Required**
+    :limit: return only first N rows of the result. *Optional*
+    :sample: return N random rows of the result. *Optional*
+    :to_file: save the result to this file in resources instead of returning it. Format is selected by extension:
+              csv, jsonl or parquet (pyarrow is required). Output is {path: <file>, count: <rows saved>}. *Optional*
+    :script: split sql into statements and run them one by one in a single transaction. Output is a list with
+             every statement's `statement`, `rowcount`, `time` in seconds and `rows` (if it returns any). *Optional*
+    :params: bind parameters for `:name` placeholders in sql: a dictionary or a list of dictionaries, which is
+             executed as a batch. Statement is not changed between calls, so its prepared plan can be reused. *Optional*
 
     :Examples:
 
@@ -59,6 +69,26 @@ class Oracle(ExternalStep, SqlAlchemyDb):
     def dialect(self) -> str:
         return "oracle+cx_oracle"
 
+    def _load_catalog(self, engine, schema: str or None) -> dict:
+        """
+        Oracle has no information_schema. Load all the columns of the owner from the data dictionary.
+        """
+        from sqlalchemy import inspect, text
+        query = """select c.table_name, c.column_name, c.data_type, nullif(c.char_length, 0), c.data_precision,
+                          c.data_scale, case when k.column_name is null then 0 else 1 end
+                   from all_tab_columns c
+                   left join (select cc.table_name, cc.column_name
+                              from all_constraints ac
+                              join all_cons_columns cc
+                                on ac.owner = cc.owner and ac.constraint_name = cc.constraint_name
+                              where ac.constraint_type = 'P' and ac.owner = :schema) k
+                     on k.table_name = c.table_name and k.column_name = c.column_name
+                   where c.owner = :schema
+                   order by c.table_name, c.column_id"""
+        schema = (schema or inspect(engine).default_schema_name).upper()
+        with engine.connect() as connection:
+            return schema_utils.build_catalog(connection.execute(text(query), {'schema': schema}))
+
     @update_variables
     def action(self, includes: dict, variables: dict) -> any:
         body = self.simple_input(variables)
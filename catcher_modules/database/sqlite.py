@@ -1,7 +1,11 @@
+import os
+
 from catcher.steps.external_step import ExternalStep
 from catcher.steps.step import update_variables
 
 from catcher_modules.database import SqlAlchemyDb
+from catcher_modules.utils import reflection_utils
+from catcher_modules.utils import schema_utils
 
 
 class SQLite(ExternalStep, SqlAlchemyDb):
@@ -12,9 +16,22 @@ class SQLite(ExternalStep, SqlAlchemyDb):
 
     :Input:
 
-    :conf:  sqlite path string. Dialect is not mandatory. **Required**.
+    :conf:  sqlite path string. Dialect is not mandatory. Object `{url: <path>, async: true}` enables
+            async engine (aiosqlite): queries from the `sql` list are run concurrently. **Required**.
     :query: query to run. **Deprecated since 5.2**
-    :sql: query or sql file from resources to run. **Required**
+    :sql: query or sql file from resources to run. Can be a list of them, the output is a list of results.
+          **Required**
+    :limit: return only first N rows of the result. *Optional*
+    :sample: return N random rows of the result. *Optional*
+    :to_file: save the result to this file in resources instead of returning it. Format is selected by extension:
+              csv, jsonl or parquet (pyarrow is required). Output is {path: <file>, count: <rows saved>}. *Optional*
+    :script: split sql into statements and run them one by one in a single transaction. Output is a list with
+             every statement's `statement`, `rowcount`, `time` in seconds and `rows` (if it returns any). *Optional*
+    :params: bind parameters for `:name` placeholders in sql: a dictionary or a list of dictionaries, which is
+             executed as a batch. Statement is not changed between calls, so its prepared plan can be reused. *Optional*
+    :snapshot: copy the database with the backup api to the file `<database>.<name>.snapshot` instead of running
+               sql. *Optional*
+    :restore: copy the snapshot with this name back to the database instead of running sql. *Optional*
 
     :Examples:
 
@@ -38,12 +55,90 @@ class SQLite(ExternalStep, SqlAlchemyDb):
               conf: '//absolute/path/to/foo.db'
               sql: 'insert into test(id, num) values(3, 3);'
 
+    Save the database state and restore it later
+    ::
+
+        sqlite:
+          actions:
+            - request:
+                conf: '/foo.db'
+                snapshot: seeded
+            - request:
+                conf: '/foo.db'
+                sql: 'delete from test'
+            - request:
+                conf: '/foo.db'
+                restore: seeded
+
       """
 
     @property
     def dialect(self) -> str:
         return "sqlite"
 
+    @property
+    def parallel_populate(self) -> bool:
+        return False  # sqlite locks the whole database on write
+
+    def snapshot(self, conf, name: str):
+        """
+        Copy the database to the snapshot file with the online backup api.
+        """
+        import sqlite3
+        engine = self.get_engine(conf)
+        path = SQLite.__snapshot_path(engine, name)
+        connection = engine.raw_connection()
+        try:
+            target = sqlite3.connect(path)
+            try:
+                connection.connection.backup(target)
+            finally:
+                target.close()
+        finally:
+            connection.close()
+        return path
+
+    def restore(self, conf, name: str):
+        """
+        Copy the snapshot file back to the database with the online backup api.
+        """
+        import sqlite3
+        engine = self.get_engine(conf)
+        path = SQLite.__snapshot_path(engine, name)
+        if not os.path.exists(path):
+            raise Exception('No snapshot ' + name + ' for ' + engine.url.database)
+        connection = engine.raw_connection()
+        try:
+            source = sqlite3.connect(path)
+            try:
+                source.backup(connection.connection)
+            finally:
+                source.close()
+        finally:
+            connection.close()
+        reflection_utils.invalidate(engine)  # schema could be changed after the snapshot
+        return path
+
+    @staticmethod
+    def __snapshot_path(engine, name: str) -> str:
+        database = engine.url.database
+        if not database or database == ':memory:':
+            raise Exception('Snapshots are not supported for in-memory databases')
+        return '{}.{}.snapshot'.format(database, name)
+
+    def _load_catalog(self, engine, schema: str or None) -> dict:
+        """
+        SQLite has no information_schema. Join all the tables with their pragma_table_info in a single query.
+        """
+        from sqlalchemy import text
+        master = 'sqlite_master' if schema is None else '"{}".sqlite_master'.format(schema)
+        query = """select m.name, p.name, p.type, null, null, null, p.pk
+                   from {master} m join pragma_table_info(m.name{schema}) p
+                   where m.type = 'table'
+                   order by m.name, p.cid""".format(master=master, schema='' if schema is None else ", :schema")
+        with engine.connect() as connection:
+            return schema_utils.build_catalog(connection.execute(text(query), {'schema': schema}))
+
     @update_variables
     def action(self, includes: dict, variables: dict) -> any:
         body = self.simple_input(variables)
@@ -0,0 +1,50 @@
+import json
+
+
+class DataMismatchException(Exception):
+    """
+    Data in the database differs from the expected one.
+    Full difference is available in `diff`: table name, lists of `missing` and `extra` rows, `mismatched` values
+    and `missing_columns`.
+    """
+
+    def __init__(self, table: str, missing: list = None, extra: list = None, mismatched: list = None,
+                 missing_columns: list = None) -> None:
+        self.diff = {'table': table, 'missing': missing or [], 'extra': extra or [],
+                     'mismatched': mismatched or [], 'missing_columns': missing_columns or []}
+        super().__init__('Data check failed for {}: {}'.format(table, DataMismatchException.__shorten(self.diff)))
+
+    @staticmethod
+    def __shorten(diff: dict, limit: int = 10) -> str:
+        short = {}
+        for key in ['missing', 'extra', 'mismatched', 'missing_columns']:
+            if diff[key]:
+                short[key] = diff[key][:limit]
+                if len(diff[key]) > limit:
+                    short[key + '_total'] = len(diff[key])
+        return json.dumps(short, default=str)
+
+
+class SchemaMismatchException(Exception):
+    """
+    Database schema differs from the expected one.
+    Full difference is available in `diff`: lists of `missing_tables`, `missing_columns`, `mismatched` column types
+    and `keys`.
+    """
+
+    def __init__(self, diff: dict) -> None:
+        self.diff = diff
+        super().__init__('Schema check failed: {}'.format(json.dumps(diff, default=str)))
+
+
+class MultipleFailuresException(Exception):
+    """
+    Several services failed at once.
+    Every service's exception is available in `errors` and the structured differences of mismatch exceptions
+    in `diff`: service name -> exception's `diff`.
+    """
+
+    def __init__(self, errors: dict) -> None:
+        self.errors = errors
+        self.diff = {name: error.diff for name, error in errors.items() if hasattr(error, 'diff')}
+        super().__init__('; '.join('{}: {}'.format(name, error) for name, error in errors.items()))
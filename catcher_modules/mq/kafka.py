@@ -1,12 +1,26 @@
-from time import sleep
+import csv
+import json
+import queue
+import random
+import time
+import uuid
+from os.path import join
+from typing import Callable, List
+
+import arrow
 
-from catcher.steps.check import Operator
 from catcher.steps.external_step import ExternalStep
 from catcher.steps.step import Step, update_variables
 from catcher.utils.logger import debug
-from catcher.utils.misc import try_get_object, fill_template_str
+from catcher.utils.misc import try_get_object, fill_template_str, inject_builtins
 from catcher.utils.time_utils import to_seconds
 from catcher_modules.mq import MqStepMixin
+from catcher_modules.utils import generator_utils
+from catcher_modules.utils import kafka_utils
+from catcher_modules.utils import predicate_utils
+
+# consumer wakes up at least this often to check the deadline
+POLL_INTERVAL_MS = 100
 
 
 class Kafka(ExternalStep, MqStepMixin):
@@ -20,16 +34,48 @@ class Kafka(ExternalStep, MqStepMixin):
     - server: is the kafka host. Can be multiple, comma-separated.
     - group_id: is the consumer group id. If not specified - `catcher` will be used. *Optional*
     - topic: the name of the topic
-    - timeout: is the consumer timeout. *Optional* (default is 1 sec)
-    - where: search for specific message clause. *Optional*
+    - timeout: is the consumer timeout. Step returns as soon as the message is found. *Optional* (default is 1 sec)
+    - where: search for specific message clause. It is compiled once: `equals` on message fields, expressions and
+      their `and`/`or` combinations are evaluated without rendering templates for every message. *Optional*
+    - prefilter: string or list of strings, which must be in the raw message. Other messages are skipped without
+      decoding. Is set automatically for `equals` on message field with a string or integer value. *Optional*
+    - fetch_min_bytes: min amount of data broker returns for a fetch request. *Optional* (default is 1)
+    - fetch_wait_max_ms: max time broker waits for fetch_min_bytes to accumulate. *Optional* (default is 100)
+    - count: number of matching messages to consume. Output is a list of them. `all` - consume all the matching
+      messages, which were in the topic when the step started. *Optional*
+    - offset: start reading from this offset instead of the group's committed one: `earliest`, `latest`, number for
+      all partitions or a dictionary {partition: offset}. *Optional*
+    - timestamp: start reading from messages produced after this time: unix timestamp in milliseconds or
+      datetime string. Messages have timestamps only if `broker_version` is 0.10.0 or later, otherwise reading
+      starts from the log segment, containing the time. *Optional*
+    - broker_version: kafka protocol version of the cluster. *Optional* (default is 0.9.0)
+    - num_consumer_fetchers: number of threads fetching partitions in parallel. *Optional* (default is 1)
 
     :produce: Produce message to kafka.
 
-    - server: is the kafka host. Can be multiple, comma-separated.
+    - server: is the kafka host. Can be multiple, comma-separated. Connection is shared between all the steps with
+      the same server.
     - topic: the name of the topic
     - data: data to be produced.
     - data_from_file: File can be used as data source. *Optional* Either `data` or `data_from_file` should present.
 
+    Bulk produce: instead of `data` set one of
+
+    - messages: list of messages. Dicts and lists are sent as json.
+    - messages_from_file: jsonl (one message per line) or csv (one json message per row) file from resources.
+      Templates are filled.
+    - generate: `{template: <message template>, count: <number of messages>}`. `INDEX` variable is the number
+      of the message.
+
+    Messages are sent by async producer, delivery reports are collected at the end. Output is
+    `{count, failed, seconds, throughput, latency_ms: {p50, p95, p99, max}}`. Producer options:
+
+    - linger_ms: max time to wait for a batch to fill. *Optional* (default is 5)
+    - min_queued_messages: batch size. *Optional* (default is 10000)
+    - max_queued_messages: max messages in the producer's queue. *Optional* (default is 100000)
+    - compression: none, gzip, snappy or lz4. *Optional* (default is none)
+    - delivery_timeout: max time to wait for all delivery reports. *Optional* (default is 60 sec)
+
     :Examples:
 
     Read message with timestamp > 1000
@@ -44,6 +90,34 @@ class Kafka(ExternalStep, MqStepMixin):
                 where:
                     equals: '{{ MESSAGE.timestamp > 1000 }}'
 
+    Read all 1000 orders of the user, produced during the test
+    ::
+
+        kafka:
+            consume:
+                server: '127.0.0.1:9092'
+                topic: 'orders'
+                timestamp: '{{ test_started }}'
+                count: 1000
+                num_consumer_fetchers: 4
+                timeout: {seconds: 30}
+                where:
+                    equals: {the: '{{ MESSAGE.user_id }}', is: '{{ user_id }}'}
+            register: {orders: '{{ OUTPUT }}'}
+
+    Find the paid order among many messages. Only messages with `paid` in raw data are decoded and checked
+    ::
+
+        kafka:
+            consume:
+                server: '127.0.0.1:9092'
+                topic: 'orders'
+                prefilter: 'paid'
+                where:
+                    and:
+                        - equals: {the: '{{ MESSAGE.order.id }}', is: '{{ order_id }}'}
+                        - equals: {the: '{{ MESSAGE.status }}', is: 'paid'}
+
     Produce `data` variable as json message
     ::
 
@@ -53,6 +127,19 @@ class Kafka(ExternalStep, MqStepMixin):
                 topic: 'test_produce_json'
                 data: '{{ data|tojson }}'
 
+    Seed the topic with 100000 generated messages
+    ::
+
+        kafka:
+            produce:
+                server: '127.0.0.1:9092'
+                topic: 'test_load'
+                generate:
+                    template: '{"id": {{ INDEX }}, "uuid": "{{ RANDOM_STR }}"}'
+                    count: 100000
+                compression: lz4
+            register: {throughput: '{{ OUTPUT.throughput }}'}
+
     """
 
     def __init__(self, **kwargs: dict) -> None:
@@ -62,29 +149,47 @@ class Kafka(ExternalStep, MqStepMixin):
         conf = kwargs[method]
         self.group_id = conf.get('group_id', 'catcher')
         self.server = conf.get('server', '127.0.0.1:9092')
+        self.broker_version = conf.get('broker_version', kafka_utils.DEFAULT_BROKER_VERSION)
         self.topic = conf['topic']
         timeout = conf.get('timeout', {'seconds': 1})
         self.timeout = to_seconds(timeout)
         self.where = conf.get('where', None)
+        self.fetch_min_bytes = conf.get('fetch_min_bytes', 1)
+        self.fetch_wait_max_ms = conf.get('fetch_wait_max_ms', 100)
+        self.count = conf.get('count', None)
+        self.offset = conf.get('offset', None)
+        self.timestamp = conf.get('timestamp', None)
+        self.num_consumer_fetchers = conf.get('num_consumer_fetchers', 1)
+        self.prefilter = conf.get('prefilter', None)
         self.message = None
+        self.bulk = None
         if self.method != 'consume':
             self.message = conf.get('data', None)
             self.file = None
-            if self.message is None:
+            bulk_keys = [k for k in ['messages', 'messages_from_file', 'generate'] if k in conf]
+            if bulk_keys:
+                self.bulk = {k: conf[k] for k in bulk_keys}
+                self.producer_options = {'linger_ms': conf.get('linger_ms', 5),
+                                         'min_queued_messages': conf.get('min_queued_messages', 10000),
+                                         'max_queued_messages': conf.get('max_queued_messages', 100000),
+                                         'compression': conf.get('compression', 'none')}
+                self.delivery_timeout = to_seconds(conf.get('delivery_timeout', {'seconds': 60}))
+            elif self.message is None:
                 self.file = conf['data_from_file']
 
     @update_variables
     def action(self, includes: dict, variables: dict) -> tuple:
-        from pykafka import KafkaClient
-        client = KafkaClient(hosts=fill_template_str(self.server, variables))
-        topic = client.topics[fill_template_str(self.topic, variables).encode('utf-8')]
+        hosts = fill_template_str(self.server, variables)
+        topic_name = fill_template_str(self.topic, variables)
         out = {}
         if self.method == 'consume':
-            out = self.consume(topic, variables)
+            out = self.consume(kafka_utils.get_topic(hosts, topic_name, self.broker_version), variables)
             if out is None:
                 raise RuntimeError('No kafka messages were consumed')
+        elif self.method == 'produce' and self.bulk is not None:
+            out = self.produce_bulk(hosts, topic_name, variables)
         elif self.method == 'produce':
-            self.produce(topic, variables)
+            self.produce(kafka_utils.get_producer(hosts, topic_name, self.broker_version), variables)
         else:
             raise AttributeError('unknown method: ' + self.method)
         return variables, out
@@ -94,40 +199,204 @@ class Kafka(ExternalStep, MqStepMixin):
         consumer = topic.get_simple_consumer(consumer_group=self.group_id.encode('utf-8'),
                                              auto_offset_reset=OffsetType.EARLIEST,
                                              reset_offset_on_start=False,
-                                             consumer_timeout_ms=self.timeout * 1000)
-        if self.where is not None:
-            operator = Operator.find_operator(self.where)
-        else:
-            operator = None
-        return Kafka.get_messages(consumer, operator, variables, self.timeout)
+                                             fetch_min_bytes=self.fetch_min_bytes,
+                                             fetch_wait_max_ms=self.fetch_wait_max_ms,
+                                             num_consumer_fetchers=self.num_consumer_fetchers,
+                                             consumer_timeout_ms=POLL_INTERVAL_MS)
+        since = self.__seek(topic, consumer, variables)
+        where, required = predicate_utils.compile_where(self.where, variables)
+        if self.prefilter is not None:
+            prefilter = self.prefilter if isinstance(self.prefilter, list) else [self.prefilter]
+            required = required + [fill_template_str(value, variables).encode('utf-8') for value in prefilter]
+        if self.count is None:
+            return Kafka.get_messages(consumer, where, self.timeout, since, required)
+        count = fill_template_str(self.count, variables)
+        return Kafka.collect_messages(consumer, where, self.timeout, None if count == 'all' else int(count),
+                                      since, required)
+
+    def __seek(self, topic, consumer, variables: dict) -> int or None:
+        """
+        Reset consumer's offsets if offset or timestamp is set.
+
+        :return: timestamp in milliseconds, messages before it should be skipped.
+        """
+        from pykafka.common import OffsetType
+        if self.timestamp is not None:
+            since = fill_template_str(self.timestamp, variables)
+            since = int(since) if since.lstrip('-').isdigit() else int(arrow.get(since).float_timestamp * 1000)
+            # offsets of the log segments, which contain the timestamp. Earlier messages are skipped by timestamp.
+            # There are no offsets if all the segments are younger than the timestamp - read from the beginning.
+            limits = topic.fetch_offset_limits(since)
+            consumer.reset_offsets([(partition, limits[partition.id].offset[0] - 1 if limits[partition.id].offset
+                                     else OffsetType.EARLIEST)
+                                    for partition in consumer.partitions.values()])
+            return since
+        if self.offset is not None:
+            offset = self.offset
+            if isinstance(offset, str):
+                offset = fill_template_str(offset, variables)
+            if offset in ('earliest', 'latest'):
+                offset = OffsetType.EARLIEST if offset == 'earliest' else OffsetType.LATEST
+                consumer.reset_offsets([(p, offset) for p in consumer.partitions.values()])
+            else:
+                offsets = offset if isinstance(offset, dict) else {p: offset for p in consumer.partitions.keys()}
+                # consumer continues from the next offset after the reset one
+                consumer.reset_offsets([(consumer.partitions[int(p)], int(o) - 1) for p, o in offsets.items()])
+        return None
 
-    def produce(self, topic, variables):
+    def produce(self, producer, variables):
         message = self.form_body(self.message, self.file, variables)
-        with topic.get_sync_producer() as producer:
-            producer.produce(message.encode('utf-8'))
+        producer.produce(message.encode('utf-8'))
+
+    def produce_bulk(self, hosts: str, topic: str, variables: dict) -> dict:
+        from pykafka.common import CompressionType
+        options = dict(self.producer_options)
+        options['compression'] = getattr(CompressionType, str(options['compression']).upper())
+        producer = kafka_utils.get_producer(hosts, topic, self.broker_version, sync=False, delivery_reports=True,
+                                            **options)
+        sent = {}  # message -> time it was sent
+        latencies = []
+        failed = 0
+        started = time.perf_counter()
+        for message in self.__bulk_messages(variables):
+            sent[id(producer.produce(message))] = time.perf_counter()
+            failed += Kafka.__collect_reports(producer, sent, latencies, block=False)
+        deadline = time.perf_counter() + self.delivery_timeout
+        while sent and time.perf_counter() < deadline:
+            failed += Kafka.__collect_reports(producer, sent, latencies, block=True)
+        spent = time.perf_counter() - started
+        count = len(latencies) + failed + len(sent)
+        if sent:
+            raise RuntimeError('No delivery reports for {} of {} messages'.format(len(sent), count))
+        debug('Produced {} messages to {} in {:.2f}s'.format(count, topic, spent))
+        return {'count': count,
+                'failed': failed,
+                'seconds': spent,
+                'throughput': count / spent if spent else count,
+                'latency_ms': Kafka.__percentiles(latencies)}
+
+    def __bulk_messages(self, variables: dict):
+        if 'messages' in self.bulk:
+            for message in self.bulk['messages']:
+                yield Kafka.__encode(message, variables)
+        if 'messages_from_file' in self.bulk:
+            path = join(variables['RESOURCES_DIR'], fill_template_str(self.bulk['messages_from_file'], variables))
+            lines = generator_utils.file_to_generator(path, variables)
+            if path.endswith('.csv'):
+                rows = csv.reader(lines)
+                header = [name.strip() for name in next(rows)]
+                for row in rows:
+                    yield json.dumps(dict(zip(header, row))).encode('utf-8')
+            else:
+                for line in lines:
+                    yield line.rstrip('\r\n').encode('utf-8')
+        if 'generate' in self.bulk:
+            template = generator_utils.compile_template(str(self.bulk['generate']['template']))
+            context = inject_builtins(variables)
+            for i in range(int(fill_template_str(self.bulk['generate']['count'], variables))):
+                yield template.render(context, INDEX=i, RANDOM_STR=str(uuid.uuid4()),
+                                      RANDOM_INT=random.randint(-2147483648, 2147483648)).encode('utf-8')
 
     @staticmethod
-    def get_messages(consumer, where: Operator or None, variables, timeout) -> dict or None:
+    def __encode(message, variables: dict) -> bytes:
+        if isinstance(message, (dict, list)):
+            message = json.dumps(message)
+        return fill_template_str(message, variables).encode('utf-8')
+
+    @staticmethod
+    def __collect_reports(producer, sent: dict, latencies: list, block: bool) -> int:
+        """
+        Collect available delivery reports.
+
+        :return: number of failed messages.
+        """
+        failed = 0
+        while sent:
+            try:
+                message, error = producer.get_delivery_report(block=block, timeout=1)
+            except queue.Empty:
+                break
+            sent_at = sent.pop(id(message), None)
+            if error is not None:
+                debug('Failed to deliver message: {}'.format(error))
+                failed += 1
+            elif sent_at is not None:
+                latencies += [(time.perf_counter() - sent_at) * 1000]
+            block = False
+        return failed
+
+    @staticmethod
+    def __percentiles(latencies: list) -> dict:
+        if not latencies:
+            return {}
+        latencies = sorted(latencies)
+        percentiles = {'p{}'.format(p): latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+                       for p in [50, 95, 99]}
+        percentiles['max'] = latencies[-1]
+        return percentiles
+
+    @staticmethod
+    def get_messages(consumer, where: Callable[[any], bool], timeout, since: int = None,
+                     required: List[bytes] = None) -> dict or None:
+        """
+        Consume messages till the matching one or the deadline.
+        """
         try:
-            while True:
-                consumer.fetch()
-                for message in consumer:
-                    value = try_get_object(message.value.decode('utf-8'))
-                    debug(value)
-                    if Kafka.check_message(where, value, variables):
-                        return value
-                if timeout > 0:
-                    sleep(1)
-                    timeout -= 1
-                else:
-                    return None
+            return next(Kafka.__matching(consumer, where, time.monotonic() + timeout, since, required), None)
         finally:
             consumer.commit_offsets()
+            consumer.stop()
+
+    @staticmethod
+    def collect_messages(consumer, where: Callable[[any], bool], timeout, count: int or None,
+                         since: int = None, required: List[bytes] = None) -> list:
+        """
+        Consume `count` matching messages. If count is None - consume all matching messages, which were in the
+        topic when the consumer started.
+        """
+        try:
+            end_offsets = None
+            if count is None:
+                end_offsets = {p: res.offset[0] for p, res in consumer.topic.latest_available_offsets().items()}
+            messages = []
+            deadline = time.monotonic() + timeout
+            for value in Kafka.__matching(consumer, where, deadline, since, required, end_offsets):
+                messages += [value]
+                if count is not None and len(messages) >= count:
+                    break
+            if count is not None and len(messages) < count:
+                raise RuntimeError('Only {} of {} kafka messages were consumed'.format(len(messages), count))
+            return messages
+        finally:
+            consumer.commit_offsets()
+            consumer.stop()
+
+    @staticmethod
+    def __matching(consumer, where: Callable[[any], bool], deadline: float, since: int = None,
+                   required: List[bytes] = None, end_offsets: dict = None):
+        """
+        Generate matching messages till the deadline or till all the partitions reach the end offsets.
+        Consumer wakes up as soon as a message arrives or every POLL_INTERVAL_MS to check the deadline.
+        Messages without required bytes are skipped without decoding.
+        """
+        while True:
+            if end_offsets is not None and Kafka.__reached(consumer, end_offsets):
+                return
+            message = consumer.consume(block=True)
+            if message is not None:
+                # messages of protocol v0 have no timestamp, they can't be skipped by it
+                if since is not None and message.timestamp and message.timestamp < since:
+                    continue
+                if required and not all(part in message.value for part in required):
+                    continue
+                value = try_get_object(message.value.decode('utf-8'))
+                debug(value)
+                if where(value):
+                    yield value
+            elif time.monotonic() >= deadline:
+                return
 
     @staticmethod
-    def check_message(where: Operator, message: str, variables: dict) -> bool:
-        if where is None:
-            return True
-        variables = dict(variables)
-        variables['MESSAGE'] = message
-        return where.operation(variables)
+    def __reached(consumer, end_offsets: dict) -> bool:
+        held = consumer.held_offsets
+        return all(held.get(p, -1) >= end - 1 for p, end in end_offsets.items())
@@ -0,0 +1,245 @@
+import os
+import tempfile
+from abc import abstractmethod
+from itertools import islice
+from os.path import join
+from typing import List, Union
+
+from catcher.utils.logger import debug
+
+from catcher_modules.exceptions.data_exceptions import DataMismatchException
+from catcher_modules.utils import dataset_utils
+
+EXPECTED_MARK = '__catcher_expected'
+ACTUAL_MARK = '__catcher_actual'
+NULL = '\x00null'
+
+
+class Comparator:
+    """
+    Compares two datasets in columnar form (pyarrow tables). All the comparisons are vectorized,
+    so millions of rows are compared in seconds.
+
+    :Input:
+
+    :expected: source of expected data.
+    :actual: source of actual data.
+
+    Source can be:
+
+    - path to the file in resources (or an absolute one).
+    - s3 object: `{s3: {config: <s3 config>, path: <bucket/path/to/file>}}`. See s3 step for the config.
+    - sql query result: `{sql: {type: <postgres/mysql/...>, conf: <db conf>, query: <query>}}`
+
+    :key: column or list of columns to join datasets on. *Optional*.
+          If not set - datasets are compared as multisets of rows.
+    :tolerance: dictionary, where key is a numeric column and value - max allowed absolute difference. *Optional*
+                Works only together with `key`.
+    :ignore: list of columns, which are not compared. *Optional*
+    :limit: max number of rows of each kind in the report. *Optional* (default is 100)
+    """
+
+    def __init__(self, expected=None, actual=None, key: Union[str, List[str]] = None, tolerance: dict = None,
+                 ignore: List[str] = None, limit: int = 100, **kwargs) -> None:
+        self.expected = expected
+        self.actual = actual
+        self.key = [key] if isinstance(key, str) else (key or [])
+        self.tolerance = tolerance or {}
+        self.ignore = ignore or []
+        self.limit = limit
+
+    @abstractmethod
+    def read(self, path: str):
+        """
+        Read file in comparator's format.
+
+        :return: pyarrow Table.
+        """
+        pass
+
+    def check(self, variables: dict):
+        """
+        Compare expected and actual data. Raise DataMismatchException with the difference report if they differ.
+        """
+        report = self.compare(self.load(self.expected, variables), self.load(self.actual, variables))
+        if report['missing'] or report['extra'] or report['mismatched'] or report['missing_columns']:
+            debug('Data mismatch: {}'.format(report))
+            raise DataMismatchException(self.__class__.__name__, missing=report['missing'], extra=report['extra'],
+                                        mismatched=report['mismatched'], missing_columns=report['missing_columns'])
+
+    def load(self, source, variables: dict):
+        """
+        Load source (local file, s3 object or sql query result) as pyarrow Table.
+        """
+        if isinstance(source, str):
+            return self.read(join(variables['RESOURCES_DIR'], source))
+        if 's3' in source:
+            return self.__load_s3(source['s3'])
+        if 'sql' in source:
+            return Comparator.__load_sql(source['sql'])
+        raise ValueError('Unknown source: {}'.format(source))
+
+    def compare(self, expected, actual) -> dict:
+        """
+        Compare two pyarrow tables.
+
+        :return: report with `missing` and `extra` rows, `mismatched` values (only if key is set) and
+                 `missing_columns` - expected columns, which are absent in the actual data.
+        """
+        columns = [c for c in expected.column_names if c not in self.ignore]
+        missing_columns = [c for c in columns if c not in actual.column_names]
+        columns = [c for c in columns if c not in missing_columns]
+        for key in self.key:
+            if key not in columns:
+                raise ValueError('Key ' + key + ' should be in both datasets')
+        expected = expected.select(columns)
+        actual = Comparator.__cast_as(actual.select(columns), expected.schema)
+        if self.key:
+            report = self.__compare_by_key(expected, actual)
+        else:
+            report = self.__compare_as_multiset(expected, actual)
+        report['missing_columns'] = missing_columns
+        return report
+
+    def __compare_by_key(self, expected, actual) -> dict:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        expected = expected.append_column(EXPECTED_MARK, pa.array([True] * expected.num_rows, pa.bool_()))
+        actual = actual.append_column(ACTUAL_MARK, pa.array([True] * actual.num_rows, pa.bool_()))
+        joined = expected.join(actual, keys=self.key, join_type='full outer',
+                               left_suffix='_expected', right_suffix='_actual', coalesce_keys=True)
+        is_missing = pc.is_null(joined[ACTUAL_MARK])
+        is_extra = pc.is_null(joined[EXPECTED_MARK])
+        both = joined.filter(pc.and_(pc.invert(is_missing), pc.invert(is_extra)))
+        mismatched = []
+        for column in [c for c in expected.column_names if c not in self.key and c != EXPECTED_MARK]:
+            left = both[column + '_expected']
+            right = both[column + '_actual']
+            differ = Comparator.__differ(left, right, self.tolerance.get(column))
+            for row in both.filter(differ).slice(0, self.limit).to_pylist():
+                mismatched += [{'key': {k: row[k] for k in self.key},
+                                'column': column,
+                                'expected': row[column + '_expected'],
+                                'actual': row[column + '_actual']}]
+        columns = [c for c in expected.column_names if c != EXPECTED_MARK]
+        return {'missing': self.__rows(joined.filter(is_missing), columns, '_expected'),
+                'extra': self.__rows(joined.filter(is_extra), columns, '_actual'),
+                'mismatched': mismatched}
+
+    def __compare_as_multiset(self, expected, actual) -> dict:
+        import pyarrow.compute as pc
+        columns = expected.column_names
+        expected = Comparator.__count_rows(expected, 'expected_count')
+        actual = Comparator.__count_rows(actual, 'actual_count')
+        joined = expected.join(actual, keys=columns, join_type='full outer', coalesce_keys=True)
+        expected_count = pc.fill_null(joined['expected_count'], 0)
+        actual_count = pc.fill_null(joined['actual_count'], 0)
+        difference = pc.subtract(expected_count, actual_count)
+        joined = joined.select(columns).append_column('difference', difference)
+        missing = joined.filter(pc.greater(difference, 0))
+        extra = joined.filter(pc.less(difference, 0))
+        extra = extra.set_column(len(columns), 'difference', pc.negate(extra['difference']))
+        return {'missing': Comparator.__counted_rows(missing.slice(0, self.limit), columns),
+                'extra': Comparator.__counted_rows(extra.slice(0, self.limit), columns),
+                'mismatched': []}
+
+    def __rows(self, table, columns: List[str], suffix: str) -> List[dict]:
+        return [{c: row[c] if c in self.key else row[c + suffix] for c in columns}
+                for row in table.slice(0, self.limit).to_pylist()]
+
+    @staticmethod
+    def __counted_rows(table, columns: List[str]) -> List[dict]:
+        return [{'row': {c: (None if row[c] == NULL else row[c]) for c in columns}, 'count': row['difference']}
+                for row in table.to_pylist()]
+
+    @staticmethod
+    def __count_rows(table, count_column: str):
+        """
+        Count the same rows. Values are compared as strings, nulls are replaced with the marker, as joins
+        don't match nulls.
+
+        :return: table with the same columns and count_column with the number of such rows.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        names = table.column_names
+        columns = [pc.fill_null(pc.cast(table[c], pa.string()), NULL) for c in names]
+        columns += [pa.array([1] * table.num_rows, pa.int64())]
+        table = pa.table(columns, names=names + [count_column])
+        # output columns order differs between pyarrow versions - select them by name
+        counted = table.group_by(names).aggregate([(count_column, 'count')])
+        return counted.select(names + [count_column + '_count']).rename_columns(names + [count_column])
+
+    @staticmethod
+    def __differ(left, right, tolerance):
+        import pyarrow.compute as pc
+        if tolerance is not None:
+            not_equal = pc.greater(pc.abs(pc.subtract(left, right)), tolerance)
+        else:
+            not_equal = pc.not_equal(left, right)
+        return pc.or_(pc.fill_null(not_equal, False), pc.xor(pc.is_null(left), pc.is_null(right)))
+
+    @staticmethod
+    def __cast_as(table, schema):
+        """
+        Cast table's columns to the types of the schema. Columns, which can't be cast, are compared as strings.
+        """
+        import pyarrow as pa
+        columns = []
+        for field in schema:
+            column = table[field.name]
+            if column.type != field.type:
+                try:
+                    column = column.cast(field.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    debug('Can\'t cast {} to {}'.format(field.name, field.type))
+            columns += [column]
+        return pa.table(columns, names=schema.names)
+
+    def __load_s3(self, source: dict):
+        import boto3
+        conf = source['config']
+        s3_client = boto3.client('s3',
+                                 endpoint_url=conf.get('url'),
+                                 aws_access_key_id=conf['key_id'],
+                                 aws_secret_access_key=conf['secret_key'],
+                                 region_name=conf.get('region')
+                                 )
+        splitted = [s for s in source['path'].split('/') if s != '']
+        bucket, filename = splitted[0], '/'.join(splitted[1:])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = join(tmp, os.path.basename(filename))
+            debug('Downloading {}/{}'.format(bucket, filename))
+            s3_client.download_file(bucket, filename, path)
+            return self.read(path).combine_chunks()  # in memory before the temporary file is deleted
+
+    @staticmethod
+    def __load_sql(source: dict):
+        import pyarrow as pa
+        import catcher_modules.database
+        from catcher_modules.utils import generator_utils, module_utils
+        service = module_utils.find_service(catcher_modules.database, source['type'])
+        if service is None:
+            raise ValueError('Unknown database type: ' + source['type'])
+        engine = service(**{source['type']: source}).get_engine(source['conf'])
+        rows = (dict(row) for row in generator_utils.query_to_generator(source['query'], engine))
+        batches = []
+        while True:
+            batch = list(islice(rows, 10000))
+            if not batch:
+                break
+            batches += [pa.Table.from_pylist(batch)]
+        return dataset_utils.concat_tables(batches)  # types of later batches can differ from the first one
+
+
+def find_comparator(name: str):
+    """
+    :param name: comparator name: csv, avro or parquet.
+    :return: comparator's class or None if there is no such comparator.
+    """
+    import catcher_modules.service.comparator
+    from catcher_modules.utils import module_utils
+    module = name + '_comparator'
+    if module not in module_utils.list_modules_in_package(catcher_modules.service.comparator):
+        return None
+    return module_utils.find_class_in_module('catcher_modules.service.comparator.' + module, name + 'comparator')
@@ -0,0 +1,36 @@
+from itertools import islice
+
+from catcher_modules.service.comparator import Comparator
+from catcher_modules.utils import dataset_utils
+
+
+class AvroComparator(Comparator):
+    """
+    Compare avro files. Fastavro is required.
+    See :class:`catcher_modules.service.comparator.Comparator` for the parameters.
+
+    :Examples:
+
+    Compare avro files as multisets of rows (no key)
+    ::
+
+        expect:
+            compare:
+                avro:
+                    expected: expected.avro
+                    actual: result.avro
+
+    """
+
+    def read(self, path: str):
+        import pyarrow as pa
+        import fastavro
+        batches = []
+        with open(path, 'rb') as f:
+            records = fastavro.reader(f)
+            while True:
+                batch = list(islice(records, 10000))
+                if not batch:
+                    break
+                batches += [pa.Table.from_pylist(batch)]
+        return dataset_utils.concat_tables(batches)
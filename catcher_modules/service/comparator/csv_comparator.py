@@ -0,0 +1,29 @@
+from catcher_modules.service.comparator import Comparator
+
+
+class CsvComparator(Comparator):
+    """
+    Compare csv files. Column types are detected automatically.
+    See :class:`catcher_modules.service.comparator.Comparator` for the parameters.
+
+    :Examples:
+
+    Compare csv file from s3 with the expected one, ignoring `updated` column
+    ::
+
+        expect:
+            compare:
+                csv:
+                    expected: expected.csv
+                    actual:
+                        s3:
+                            config: '{{ s3_config }}'
+                            path: /my_bucket/result.csv
+                    key: id
+                    ignore: [updated]
+
+    """
+
+    def read(self, path: str):
+        from pyarrow import csv
+        return csv.read_csv(path)
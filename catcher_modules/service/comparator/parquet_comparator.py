@@ -0,0 +1,29 @@
+from catcher_modules.service.comparator import Comparator
+
+
+class ParquetComparator(Comparator):
+    """
+    Compare parquet files. See :class:`catcher_modules.service.comparator.Comparator` for the parameters.
+
+    :Examples:
+
+    Compare parquet file with the query result, allowing 0.01 difference in price
+    ::
+
+        expect:
+            compare:
+                parquet:
+                    expected: expected.parquet
+                    actual:
+                        sql:
+                            type: postgres
+                            conf: '{{ postgres }}'
+                            query: 'select id, price from orders'
+                    key: id
+                    tolerance: {price: 0.01}
+
+    """
+
+    def read(self, path: str):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True)
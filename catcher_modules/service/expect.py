@@ -1,5 +1,8 @@
+from functools import partial
+
 from catcher.steps.external_step import ExternalStep
-from catcher_modules.utils import module_utils
+from catcher_modules.service.comparator import find_comparator
+from catcher_modules.utils import module_utils, concurrency_utils
 import catcher_modules.database
 
 
@@ -13,7 +16,7 @@ class Expect(ExternalStep):
     * populate step is designed to be supported by all steps (in future). Currently it is supported only
       by Postges/Oracle/MSSql/MySql/SQLite steps.
     * Schema comparison is not implemented.
-    * You can use strict comparison (only data from csv should be in the table, in the same order as csv)
+    * You can use strict comparison (only data from csv should be in the table, in any order)
       or the default one (just check if the data is there)
 
     :Input:
@@ -22,6 +25,9 @@ class Expect(ExternalStep):
 
     - <service_name>: See each own step's documentation for the parameters description and
                       information. Note, that not all steps are compatible with prepare step.
+    - csv/avro/parquet: Compare two datasets (files, s3 objects or sql query results).
+                        See :class:`catcher_modules.service.comparator.Comparator` for the parameters.
+    - workers: Number of services checked at the same time. *Optional* (default is 4)
 
     Check expected schema and data in postgres.
     ::
@@ -51,18 +57,39 @@ class Expect(ExternalStep):
                         schema: {{ expected_schema }}
                         data: {{ expected_data }}
 
+    Compare the csv file in s3 with the expected one by `id` column.
+    ::
+
+        steps:
+            - expect:
+                compare:
+                    csv:
+                        expected: expected.csv
+                        actual:
+                            s3:
+                                config: {{ s3_config }}
+                                path: /my_bucket/result.csv
+                        key: id
+
     """
 
     def action(self, includes: dict, variables: dict) -> dict or tuple:
         input_data = self.simple_input(variables)
-        db_modules = module_utils.list_modules_in_package(catcher_modules.database)
+        workers = input_data['compare'].get('workers', 4)
+        tasks = {}
         for service, data in input_data['compare'].items():
-            if service in db_modules:  # database
-                found = module_utils.find_class_in_module('catcher_modules.database.' + service, service)
-                found(**{service: data}).expect(variables, **data)
+            if service == 'workers':
+                continue
+            found = module_utils.find_service(catcher_modules.database, service)
+            if found is not None:  # database
+                tasks[service] = partial(found(**{service: data}).expect, variables, **data)
+            comparator = find_comparator(service)
+            if comparator is not None:  # files or query results
+                tasks[service] = partial(comparator(**data).check, variables)
             # TODO mongodb
             # TODO mq
             # TODO cache
             # TODO s3
             # TODO http mock
+        concurrency_utils.run_all(tasks, workers)
         return variables
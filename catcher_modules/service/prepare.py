@@ -1,8 +1,10 @@
+from functools import partial
+
 from catcher.steps.external_step import ExternalStep
 
 import catcher_modules.database
 from catcher.utils import misc
-from catcher_modules.utils import module_utils
+from catcher_modules.utils import module_utils, concurrency_utils
 
 
 class Prepare(ExternalStep):
@@ -29,6 +31,7 @@ class Prepare(ExternalStep):
     - <service_name>: See each own step's documentation for the parameters description and
                       information. Note, that not all steps are compatible with prepare step.
     - variables: Variables, which will override state (only for this prepare step).
+    - workers: Number of services populated at the same time. *Optional* (default is 4)
 
     Please, keep it mind, that resources directory is used for all data and schema files.
 
@@ -43,7 +46,7 @@ class Prepare(ExternalStep):
                         schema: {{ pg_schema_file }}
                         data: {{ pg_data_file }}
 
-    Multiple populates and can be run at the same time. This will populate existing s3 with data, start local
+    Multiple populates can be run at the same time (in parallel). This will populate existing s3 with data, start local
     salesforce and postgres in docker and populates them as well.
     ::
 
@@ -74,14 +77,16 @@ class Prepare(ExternalStep):
     def action(self, includes: dict, variables: dict) -> dict or tuple:
         input_data = self.simple_input(variables)
         variables_override = misc.merge_two_dicts(variables, input_data['populate'].get('variables'))
-        db_modules = module_utils.list_modules_in_package(catcher_modules.database)
+        workers = input_data['populate'].get('workers', 4)
+        tasks = {}
         for service, data in input_data['populate'].items():
-            if service == 'variables':
+            if service in ['variables', 'workers']:
                 continue
-            if service in db_modules:  # database
-                found = module_utils.find_class_in_module('catcher_modules.database.' + service, service)
-                found(**{service: data}).populate(variables_override, **data)
+            found = module_utils.find_service(catcher_modules.database, service)
+            if found is not None:  # database
+                tasks[service] = partial(found(**{service: data}).populate, variables_override, **data)
             # TODO cache
             # TODO s3
             # TODO http mock
+        concurrency_utils.run_all(tasks, workers)
         return variables
@@ -0,0 +1,41 @@
+import asyncio
+import atexit
+import threading
+
+# all async engines live on this loop: their pooled connections are bound to the loop they were created on
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def run(coroutine):
+    """
+    Run coroutine on the shared event loop and wait for its result.
+    Loop is started in a background thread on the first call and is shared between all the steps.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, __get_loop()).result()
+
+
+def stop():
+    """
+    Stop the shared event loop. Is called automatically at exit. Async engines are disposed first, their
+    connections can be closed only on the running loop.
+    """
+    global _loop
+    from catcher_modules.utils import db_utils
+    db_utils.dispose_async_engines()
+    with _loop_lock:
+        if _loop is not None:
+            _loop.call_soon_threadsafe(_loop.stop)
+            _loop = None
+
+
+atexit.register(stop)
+
+
+def __get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='catcher-modules-async', daemon=True).start()
+        return _loop
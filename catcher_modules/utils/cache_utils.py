@@ -0,0 +1,76 @@
+import hashlib
+import json
+from typing import Dict, Tuple
+
+from catcher_modules.utils import dataset_utils
+from catcher_modules.utils import generator_utils
+
+# populated content is recorded in this table of the target database
+CACHE_TABLE = 'catcher_populate_cache'
+# cache entry for the schema file
+SCHEMA_KEY = '__schema__'
+
+
+def fingerprint_text(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def fingerprint_file(path: str, variables: dict, options: dict = None) -> str:
+    """
+    Fingerprint of the data file's content. Templates are filled for csv, so the same file with different
+    variables has different fingerprints.
+
+    :param options: options the file is loaded with, f.e. `use_json`. The same file, loaded with different options,
+                    has different fingerprints.
+    """
+    digest = hashlib.sha1(json.dumps(options or {}, sort_keys=True).encode('utf-8'))
+    if dataset_utils.is_columnar(path):
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    else:
+        for line in generator_utils.file_to_generator(path, variables):
+            digest.update(line.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load(engine) -> Dict[str, Tuple[str, int]]:
+    """
+    Read the cache. Nothing is cached if there is no cache table yet.
+
+    :return: name -> (fingerprint, row count) for the schema and every populated table.
+    """
+    from sqlalchemy import inspect
+    if not inspect(engine).has_table(CACHE_TABLE):
+        return {}
+    table = __cache_table(engine)
+    with engine.connect() as connection:
+        return {row.name: (row.fingerprint, row.row_count) for row in connection.execute(table.select())}
+
+
+def save(engine, entries: Dict[str, Tuple[str, int]], replace_all=False):
+    """
+    Record the populated content. Cache table is created if there is no such table: it could be dropped by
+    the schema.
+
+    :param entries: name -> (fingerprint, row count).
+    :param replace_all: forget all the other entries. F.e. after the schema was changed.
+    """
+    table = __cache_table(engine)
+    table.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        if replace_all:
+            connection.execute(table.delete())
+        elif entries:
+            connection.execute(table.delete().where(table.c.name.in_(list(entries.keys()))))
+        if entries:
+            connection.execute(table.insert(), [{'name': name, 'fingerprint': fingerprint, 'row_count': count}
+                                                for name, (fingerprint, count) in entries.items()])
+
+
+def __cache_table(engine):
+    from sqlalchemy import Table, MetaData, Column, String, Integer
+    return Table(CACHE_TABLE, MetaData(),
+                 Column('name', String(255), primary_key=True),
+                 Column('fingerprint', String(40)),
+                 Column('row_count', Integer))
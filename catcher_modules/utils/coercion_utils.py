@@ -0,0 +1,109 @@
+import datetime
+import json
+from decimal import Decimal
+from typing import Callable, Iterable, List
+
+
+def coercion_plan(columns) -> List[Callable]:
+    """
+    Build converters for the columns once, so that rows are converted without looking up column types for
+    every value.
+
+    :param columns: sqlalchemy columns in the order of row's values.
+    :return: list of converters, one per column.
+    """
+    return [__converter(column.type) for column in columns]
+
+
+def coerce_rows(plan: List[Callable], rows: Iterable) -> List[tuple]:
+    """
+    Convert every value of every row with the converter of its column.
+    """
+    return [tuple([convert(value) for convert, value in zip(plan, row)]) for row in rows]
+
+
+def __converter(column_type) -> Callable:
+    from sqlalchemy import JSON
+    if isinstance(column_type, JSON):
+        return __to_json
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:  # type is unknown to sqlalchemy, pass values as is
+        return __as_is
+    if python_type is int:
+        return __to_int
+    if python_type is float:
+        return __to_float
+    if python_type is Decimal:
+        return __to_decimal
+    if python_type is datetime.datetime:
+        return __to_datetime
+    if python_type is datetime.date:
+        return __to_date
+    return lambda value: __to_type(value, python_type)
+
+
+def __as_is(value):
+    return value
+
+
+def __to_type(value, python_type):
+    if isinstance(value, python_type):
+        return value
+    return python_type(value) if value else None
+
+
+def __to_int(value):
+    if value is None or value == '':
+        return None
+    if value.__class__ is int:
+        return value
+    return int(value)
+
+
+def __to_float(value):
+    if value is None or value == '':
+        return None
+    if value.__class__ is float:
+        return value
+    return float(value)
+
+
+def __to_decimal(value):
+    if value is None or value == '':
+        return None
+    if value.__class__ is Decimal:
+        return value
+    return Decimal(value) if isinstance(value, str) else Decimal(str(value))
+
+
+def __to_datetime(value):
+    if not value or isinstance(value, datetime.datetime):
+        return value or None
+    if isinstance(value, str):
+        try:
+            parsed = datetime.datetime.fromisoformat(value)
+            # the same as arrow - naive time is in utc
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            pass
+    import arrow
+    return arrow.get(value).datetime
+
+
+def __to_date(value):
+    if not value or (isinstance(value, datetime.date) and not isinstance(value, datetime.datetime)):
+        return value or None
+    if isinstance(value, str):
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            pass
+    import arrow
+    return arrow.get(value).date()
+
+
+def __to_json(value):
+    if isinstance(value, str):
+        return json.loads(value) if value else None
+    return value
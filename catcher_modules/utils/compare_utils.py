@@ -0,0 +1,79 @@
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from os.path import join
+from typing import List, Tuple
+
+
+class MultisetDiff:
+    """
+    Order-insensitive comparison of two streams of rows.
+    Every row is counted in a hash partition: +1 for expected rows and -1 for actual ones, so memory depends on the
+    number of distinct rows, not on the order they come in. If there are too many distinct rows in memory -
+    partitions are spilled to the disk and merged back one by one, when the difference is calculated.
+    """
+
+    def __init__(self, partitions: int = 64, max_rows_in_memory: int = 500000) -> None:
+        self.partitions = partitions
+        self.max_rows_in_memory = max_rows_in_memory
+        self._counters = [Counter() for _ in range(partitions)]
+        self._in_memory = 0
+        self._spill_dir = None
+
+    def add_expected(self, row: tuple):
+        self.__add(row, 1)
+
+    def add_actual(self, row: tuple):
+        self.__add(row, -1)
+
+    def diff(self) -> Tuple[List[Tuple[tuple, int]], List[Tuple[tuple, int]]]:
+        """
+        :return: rows missing in actual and extra rows in actual, with the number of times they are missing/extra.
+        """
+        missing = []
+        extra = []
+        try:
+            for partition in range(self.partitions):
+                for key, count in self.__load_partition(partition).items():
+                    if count > 0:
+                        missing += [(tuple(json.loads(key)), count)]
+                    elif count < 0:
+                        extra += [(tuple(json.loads(key)), -count)]
+        finally:
+            if self._spill_dir is not None:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
+        return missing, extra
+
+    def __add(self, row: tuple, count: int):
+        key = json.dumps(row)
+        counter = self._counters[hash(key) % self.partitions]
+        if key not in counter:
+            self._in_memory += 1
+        counter[key] += count
+        if self._in_memory > self.max_rows_in_memory:
+            self.__spill()
+
+    def __spill(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='catcher_diff_')
+        for partition, counter in enumerate(self._counters):
+            if not counter:
+                continue
+            with open(join(self._spill_dir, str(partition)), 'a') as f:
+                for key, count in counter.items():
+                    if count != 0:
+                        f.write('{}\t{}\n'.format(count, key))
+            counter.clear()
+        self._in_memory = 0
+
+    def __load_partition(self, partition: int) -> Counter:
+        counter = self._counters[partition]
+        if self._spill_dir is not None and os.path.exists(join(self._spill_dir, str(partition))):
+            with open(join(self._spill_dir, str(partition))) as f:
+                for line in f:
+                    [count, key] = line.rstrip('\n').split('\t', 1)
+                    counter[key] += int(count)
+        return counter
@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from catcher.utils.logger import debug
+
+from catcher_modules.exceptions.data_exceptions import MultipleFailuresException
+
+
+def run_all(tasks: Dict[str, Callable], workers: int):
+    """
+    Run all the tasks in a thread pool and wait for all of them to finish.
+
+    :param tasks: task name -> function without arguments.
+    :param workers: max number of tasks running at the same time.
+    :raise Exception: task's error if one task failed, MultipleFailuresException with all the errors if many.
+    """
+    if not tasks:
+        return
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks)))) as executor:
+        futures = {name: executor.submit(task) for name, task in tasks.items()}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                debug('{} failed: {}'.format(name, e))
+                errors[name] = e
+    if len(errors) == 1:
+        [error] = errors.values()
+        raise error
+    if errors:
+        raise MultipleFailuresException(errors)
@@ -0,0 +1,181 @@
+import csv
+import json
+import random
+import tempfile
+from itertools import islice
+from os.path import join
+from typing import Iterable, Iterator, List, Tuple
+
+COLUMNAR_FORMATS = ('.parquet', '.arrow', '.feather', '.ipc')
+
+
+def is_columnar(path: str) -> bool:
+    """
+    Is this file a Parquet or an Arrow IPC (Feather) file.
+    """
+    return path.endswith(COLUMNAR_FORMATS)
+
+
+def read_columnar(path: str, batch_size: int = 10000) -> Tuple[List[str], Iterator]:
+    """
+    Read Parquet or Arrow IPC (Feather) file. File is memory-mapped, batches are not copied until converted to
+    python objects.
+
+    :return: column names and iterator over pyarrow record batches.
+    """
+    import pyarrow as pa
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path, memory_map=True)
+        return parquet.schema_arrow.names, parquet.iter_batches(batch_size=batch_size)
+    source = pa.memory_map(path)
+    try:
+        reader = pa.ipc.open_file(source)
+        return reader.schema.names, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:  # not a file, but a stream format
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        return reader.schema.names, iter(reader)
+
+
+def read_columnar_rows(path: str) -> Tuple[List[str], Iterator[tuple]]:
+    """
+    Read Parquet or Arrow IPC (Feather) file row by row.
+
+    :return: column names and iterator over rows with typed values.
+    """
+    names, batches = read_columnar(path)
+    return names, (row for batch in batches for row in zip(*[column.to_pylist() for column in batch.columns]))
+
+
+def concat_tables(tables: list):
+    """
+    Concatenate pyarrow tables, which types were inferred separately. F.e. column can be null in the first batch
+    of rows and filled in the next ones, or have ints first and floats later.
+    """
+    import pyarrow as pa
+    if not tables:
+        return pa.table({})
+    schema = unify_schemas([table.schema for table in tables])
+    return pa.concat_tables([cast_to_schema(table, schema) for table in tables])
+
+
+def unify_schemas(schemas: list):
+    """
+    Common schema for the tables. Nulls take the type of the other tables, integers mixed with floats are floats,
+    other different types are strings. Columns order is the order of their first appearance.
+    """
+    import pyarrow as pa
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            types.setdefault(field.name, []).append(field.type)
+    return pa.schema([(name, __common_type(column_types)) for name, column_types in types.items()])
+
+
+def cast_to_schema(table, schema):
+    """
+    Cast table's columns to the schema's types. Missing columns are filled with nulls.
+    """
+    import pyarrow as pa
+    columns = [table[field.name].cast(field.type) if field.name in table.column_names
+               else pa.nulls(table.num_rows, field.type) for field in schema]
+    return pa.table(columns, schema=schema)
+
+
+def __common_type(types: list):
+    import pyarrow as pa
+    distinct = []
+    for data_type in types:
+        if not pa.types.is_null(data_type) and data_type not in distinct:
+            distinct += [data_type]
+    if not distinct:
+        return pa.null()
+    if len(distinct) == 1:
+        return distinct[0]
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in distinct):
+        return pa.float64() if any(pa.types.is_floating(t) for t in distinct) else pa.int64()
+    return pa.string()
+
+
+def sample_rows(rows: Iterable, size: int) -> list:
+    """
+    Reservoir sampling: select `size` random rows, reading each row only once.
+    """
+    sample = []
+    for i, row in enumerate(rows):
+        if i < size:
+            sample += [row]
+        else:
+            j = random.randint(0, i)
+            if j < size:
+                sample[j] = row
+    return sample
+
+
+def write_rows(path: str, rows: Iterable[dict], batch_size: int = 10000) -> int:
+    """
+    Write rows to the file. Format is selected by file's extension: csv, jsonl or parquet.
+
+    :return: number of rows written.
+    """
+    if path.endswith('.csv'):
+        return __write_csv(path, rows)
+    if path.endswith('.jsonl'):
+        return __write_jsonl(path, rows)
+    if path.endswith('.parquet'):
+        return __write_parquet(path, rows, batch_size)
+    raise Exception('Unsupported file format: ' + path + '. Use csv, jsonl or parquet.')
+
+
+def __write_csv(path: str, rows: Iterable[dict]) -> int:
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.writer(f)
+                writer.writerow(row.keys())
+            writer.writerow(['' if v is None else v for v in row.values()])
+            count += 1
+    return count
+
+
+def __write_jsonl(path: str, rows: Iterable[dict]) -> int:
+    count = 0
+    with open(path, 'w') as f:
+        for row in rows:
+            f.write(json.dumps(row, default=str) + '\n')
+            count += 1
+    return count
+
+
+def __write_parquet(path: str, rows: Iterable[dict], batch_size: int) -> int:
+    """
+    Types are known only after all the rows are read: column can be null in the first batches or have ints
+    before floats. Batches are spilled to temporary arrow files and written with the unified schema at the end,
+    so memory doesn't depend on the number of rows.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    count = 0
+    rows = iter(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        spilled = []
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            table = pa.Table.from_pylist(batch)
+            spilled += [(join(tmp, '{}.arrow'.format(len(spilled))), table.schema)]
+            with pa.OSFile(spilled[-1][0], 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            count += len(batch)
+        if not spilled:
+            return 0
+        schema = unify_schemas([schema for _, schema in spilled])
+        with pq.ParquetWriter(path, schema) as writer:
+            for part, _ in spilled:
+                with pa.memory_map(part) as source:
+                    writer.write_table(cast_to_schema(pa.ipc.open_file(source).read_all(), schema))
+    return count
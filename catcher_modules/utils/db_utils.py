@@ -1,6 +1,9 @@
+import atexit
+import threading
+import time
 from typing import Union
 
-from catcher.utils.logger import warning
+from catcher.utils.logger import debug, warning
 
 default_ports = {
     'postgresql': 5432,
@@ -10,8 +13,19 @@ default_ports = {
     'oracle+cx_oracle': 1521
 }
 
+pool_options = ['pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping']
 
-def get_engine(conf: Union[str, dict], dialect: str = 'postgresql', driver: str = None):
+# engines are shared between all steps of the run: (url, pool options) -> [engine, last time used]
+_engines = {}
+_engines_lock = threading.Lock()
+# async engines: (url, pool options) -> engine
+_async_engines = {}
+async_drivers = {'postgresql': 'asyncpg', 'mysql': 'aiomysql', 'sqlite': 'aiosqlite'}
+# engines, which were not used for this amount of seconds, are disposed
+engine_idle_timeout = 600
+
+
+def get_url(conf: Union[str, dict], dialect: str = 'postgresql', driver: str = None) -> str:
     """
     :param conf: there are 3 options for configuring a database connection.
       1. String configuration. All parameters are included in single string:
@@ -31,8 +45,11 @@ def get_engine(conf: Union[str, dict], dialect: str = 'postgresql', driver: str
             port: 5433
             extra: '{"key": "value"}'
             type: 'postgres'
+      Object configurations can also contain connection pool settings, which are used when the engine is created:
+      pool_size, max_overflow, pool_timeout, pool_recycle and pool_pre_ping.
     :param dialect: dialect configuration for sqlalchemy.
     :param driver: driver configuration for pyodbc. Optional
+    :return: sqlalchemy connection url.
     """
 
     if not isinstance(conf, str):  # object or string-object representation
@@ -45,8 +62,118 @@ def get_engine(conf: Union[str, dict], dialect: str = 'postgresql', driver: str
 
     if driver is not None and 'driver' not in conf_str:  # pyodbc
         conf_str += '?driver={}'.format(driver.replace(' ', '+'))
+    return conf_str
+
+
+def get_engine(conf: Union[str, dict], dialect: str = 'postgresql', driver: str = None):
+    """
+    :param conf: database configuration, see get_url.
+    :param dialect: dialect configuration for sqlalchemy.
+    :param driver: driver configuration for pyodbc. Optional
+    :return: engine, shared between all the steps with the same connection url and pool settings.
+    """
+    from sqlalchemy.engine.url import make_url
+    conf_str = get_url(conf, dialect, driver)
+    key = (str(make_url(conf_str)), __pool_options(conf))
+    with _engines_lock:
+        __evict_idle(key)
+        if key not in _engines:
+            _engines[key] = [__create_engine(conf_str, conf), None]
+        cached = _engines[key]
+        cached[1] = time.monotonic()
+        return cached[0]
+
+
+def is_async(conf: Union[str, dict]) -> bool:
+    """
+    Should the async engine be used for this configuration. It is enabled with `async: true` in object
+    configuration.
+    """
+    return isinstance(conf, dict) and bool(conf.get('async', False))
+
+
+def get_async_engine(conf: Union[str, dict], dialect: str = 'postgresql'):
+    """
+    Async engine uses asyncpg, aiomysql or aiosqlite driver instead of the sync one. Should be used only on the
+    async_utils loop.
+
+    :param conf: database configuration, see get_url.
+    :param dialect: dialect configuration for sqlalchemy.
+    :return: async engine, shared between all the steps with the same connection url and pool settings.
+    """
+    from sqlalchemy.engine.url import make_url
+    from sqlalchemy.ext.asyncio import create_async_engine
+    url = make_url(get_url(conf, dialect))
+    backend = url.get_backend_name()
+    if backend not in async_drivers:
+        raise Exception('Async engine is not supported for ' + backend)
+    url = url.set(drivername=backend + '+' + async_drivers[backend])
+    options = __pool_options(conf)
+    key = (str(url), options)
+    with _engines_lock:
+        if key not in _async_engines:
+            debug('Creating async engine for {}'.format(str(url).split('@')[-1]))
+            _async_engines[key] = create_async_engine(url, **dict(options))
+        return _async_engines[key]
+
+
+def dispose_engines():
+    """
+    Close all the pooled connections and forget the engines. Is called automatically at exit.
+    """
+    with _engines_lock:
+        for engine, _ in _engines.values():
+            engine.dispose()
+        _engines.clear()
+    dispose_async_engines()
+
+
+def dispose_async_engines():
+    """
+    Close connections of the async engines on the loop they were created on. Should be called before the loop
+    is stopped.
+    """
+    from catcher_modules.utils import async_utils
+    with _engines_lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+    for engine in engines:  # outside the lock: loop's coroutines could wait for it
+        try:
+            async_utils.run(engine.dispose())
+        except Exception as e:
+            warning('Can\'t dispose async engine: {}'.format(e))
+
+
+atexit.register(dispose_engines)
+
+
+def __create_engine(conf_str: str, conf: Union[str, dict]):
     from sqlalchemy import create_engine
-    return create_engine(conf_str)
+    debug('Creating engine for {}'.format(conf_str.split('@')[-1]))
+    return create_engine(conf_str, **dict(__pool_options(conf)))
+
+
+def __pool_options(conf: Union[str, dict]) -> tuple:
+    """
+    :return: connection pool settings of the configuration as sorted (name, value) pairs, so they can be a part of
+             the engine's cache key.
+    """
+    if not isinstance(conf, dict):
+        return ()
+    return tuple(sorted((k, v) for k, v in conf.items() if k in pool_options))
+
+
+def __evict_idle(current: tuple):
+    """
+    Dispose engines, which weren't used for more than engine_idle_timeout.
+
+    :param current: key of the engine, which is about to be used: (url, pool options). It is never evicted.
+    """
+    now = time.monotonic()
+    for key, (engine, last_used) in list(_engines.items()):
+        if key != current and now - last_used > engine_idle_timeout:
+            engine.dispose()
+            del _engines[key]
 
 
 def __construct_str_configuration(conf, dialect):
@@ -1,4 +1,11 @@
 import csv
+from functools import lru_cache
+
+from catcher.utils.logger import debug
+from catcher.utils.misc import fill_template_str, inject_builtins
+
+EXPRESSION_MARKERS = ('{{', '}}')
+BLOCK_MARKERS = ('{%', '{#')
 
 
 def csv_to_generator(stream):
@@ -7,14 +14,148 @@ def csv_to_generator(stream):
 
 
 def table_to_generator(table, engine):
-    connection = engine.connect()
-    proxy = connection.execution_options(stream_results=True).execute("select * from {}".format(table))
-    while True:
-        batch = proxy.fetchmany(1000)
-        if not batch:
-            break
-
-        for row in batch:
-            yield row
-    proxy.close()
-    connection.close()
+    return query_to_generator("select * from {}".format(table), engine)
+
+
+def query_to_generator(query, engine, params: dict = None):
+    """
+    Stream query results with a server side cursor. Close the generator to release the cursor and the connection,
+    if it is not consumed till the end.
+    """
+    with engine.connect() as connection:
+        if params is None:
+            proxy = connection.execution_options(stream_results=True).execute(query)
+        else:
+            from sqlalchemy import text
+            proxy = connection.execution_options(stream_results=True).execute(text(query), params)
+        try:
+            while True:
+                batch = proxy.fetchmany(1000)
+                if not batch:
+                    break
+
+                for row in batch:
+                    yield row
+        finally:
+            proxy.close()
+
+
+def file_to_generator(path: str, variables: dict):
+    """
+    Stream non-empty lines of the file with templates filled.
+
+    * file without templates is streamed as is.
+    * file with expressions only (`{{ }}`) is rendered line by line.
+    * file with blocks (`{% %}`) is compiled once and its output is streamed.
+
+    :param path: path to the file.
+    :param variables: variables to fill templates with.
+    """
+    mode = __template_mode(path)
+    if mode is None:
+        lines = __read_lines(path)
+    elif mode == 'line':
+        lines = __render_lines(path, variables)
+    else:
+        lines = __render_file(path, variables)
+    for line in lines:
+        if line.strip('\r\n'):
+            yield line
+
+
+def __template_mode(path: str) -> str or None:
+    mode = None
+    with open(path) as f:
+        for line in f:
+            if '{' not in line:
+                continue
+            if any(marker in line for marker in BLOCK_MARKERS) \
+                    or line.count(EXPRESSION_MARKERS[0]) != line.count(EXPRESSION_MARKERS[1]):
+                return 'file'
+            if EXPRESSION_MARKERS[0] in line:
+                mode = 'line'
+    return mode
+
+
+def __read_lines(path: str):
+    with open(path) as f:
+        yield from f
+
+
+def __render_lines(path: str, variables: dict):
+    from jinja2 import UndefinedError
+    context = inject_builtins(variables)
+    with open(path) as f:
+        for line in f:
+            if EXPRESSION_MARKERS[0] in line:
+                try:
+                    line = __fill_rendered(__compile_line(line).render(context), variables)
+                except UndefinedError as e:  # the same as catcher's render - leave it as is
+                    debug(e.message)
+            yield line
+
+
+def __render_file(path: str, variables: dict):
+    from jinja2 import UndefinedError
+    with open(path) as f:
+        template = __environment().from_string(f.read())
+    buffer = ''
+    try:
+        for chunk in template.generate(inject_builtins(variables)):
+            buffer += chunk
+            if '\n' in buffer:
+                *lines, buffer = buffer.split('\n')
+                for line in lines:
+                    yield __fill_rendered(line, variables) + '\n'
+    except UndefinedError as e:
+        raise Exception('Can\'t fill templates in {}: {}'.format(path, e.message))
+    if buffer:
+        yield __fill_rendered(buffer, variables)
+
+
+def __fill_rendered(rendered: str, variables: dict) -> str:
+    if EXPRESSION_MARKERS[0] in rendered:  # variable's value is a template itself
+        return fill_template_str(rendered, variables)
+    return rendered
+
+
+def compile_template(source: str):
+    """
+    Compile the template once to render it many times. Catcher's filters and functions are available.
+
+    :return: jinja2 template.
+    """
+    return __compile_line(source)
+
+
+def compile_expression(source: str):
+    """
+    Compile jinja2 expression (without `{{ }}`) once to evaluate it many times.
+
+    :return: callable, which takes variables as keyword arguments and returns the expression's value.
+    """
+    return __environment().compile_expression(source)
+
+
+def undeclared_variables(source: str) -> set:
+    """
+    :return: names of the variables the template uses.
+    """
+    from jinja2 import meta
+    return meta.find_undeclared_variables(__environment().parse(source))
+
+
+@lru_cache(maxsize=1024)
+def __compile_line(line: str):
+    return __environment().from_string(line)
+
+
+@lru_cache(maxsize=1)
+def __environment():
+    from jinja2 import Environment
+    from catcher.core.filters_factory import FiltersFactory
+    environment = Environment(keep_trailing_newline=True)
+    holder = FiltersFactory()
+    environment.filters.update(holder.filters)
+    environment.globals.update(holder.functions)
+    return environment
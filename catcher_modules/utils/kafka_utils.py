@@ -0,0 +1,63 @@
+import atexit
+import threading
+
+from catcher.utils.logger import debug, warning
+
+# pykafka's default protocol version. Messages have timestamps only since 0.10.0
+DEFAULT_BROKER_VERSION = '0.9.0'
+# clients are shared between all steps of the run: (hosts, broker version) -> KafkaClient
+_clients = {}
+# producers: (hosts, broker version, topic, producer options) -> producer
+_producers = {}
+_lock = threading.RLock()
+
+
+def get_client(hosts: str, broker_version: str = DEFAULT_BROKER_VERSION):
+    """
+    :param hosts: bootstrap servers, comma-separated.
+    :param broker_version: protocol version of the cluster.
+    :return: client, shared between all the steps with the same hosts. Cluster metadata is discovered only once.
+    """
+    from pykafka import KafkaClient
+    key = (hosts, broker_version)
+    with _lock:
+        if key not in _clients:
+            debug('Connecting to kafka {}'.format(hosts))
+            _clients[key] = KafkaClient(hosts=hosts, broker_version=broker_version)
+        return _clients[key]
+
+
+def get_topic(hosts: str, topic: str, broker_version: str = DEFAULT_BROKER_VERSION):
+    return get_client(hosts, broker_version).topics[topic.encode('utf-8')]
+
+
+def get_producer(hosts: str, topic: str, broker_version: str = DEFAULT_BROKER_VERSION, **options):
+    """
+    :param options: pykafka producer options. F.e. `sync`, `linger_ms`, `delivery_reports`.
+                    Sync producer is created by default.
+    :return: producer, shared between all the steps producing to the same topic with the same options.
+             It is stopped at exit.
+    """
+    options.setdefault('sync', True)
+    key = (hosts, broker_version, topic, tuple(sorted(options.items())))
+    with _lock:
+        if key not in _producers:
+            _producers[key] = get_topic(hosts, topic, broker_version).get_producer(**options)
+        return _producers[key]
+
+
+def close_all():
+    """
+    Stop all the producers and forget the clients. Is called automatically at exit.
+    """
+    with _lock:
+        for (_, _, topic, _), producer in _producers.items():
+            try:
+                producer.stop()
+            except Exception as e:
+                warning('Can\'t stop kafka producer for {}: {}'.format(topic, e))
+        _producers.clear()
+        _clients.clear()
+
+
+atexit.register(close_all)
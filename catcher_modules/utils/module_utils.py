@@ -1,28 +1,39 @@
+import importlib
+import inspect
 import pkgutil
-import sys, inspect
-from typing import List
+from functools import lru_cache
+from typing import Tuple
 
 
-def list_modules_in_package(pkg_name) -> List[str]:
+@lru_cache(maxsize=None)
+def list_modules_in_package(pkg_name) -> Tuple[str]:
     """
     :param pkg_name: imported package
-    :return: list of modules inside the package (modules will be loaded)
+    :return: names of modules inside the package (modules are not loaded). Result is cached.
     """
-    modules = []
-    for importer, modname, ispkg in pkgutil.iter_modules(pkg_name.__path__):
-        if not ispkg:
-            importer.find_module(modname).load_module(modname)
-            modules += [modname]
-    return modules
+    return tuple(modname for _, modname, ispkg in pkgutil.iter_modules(pkg_name.__path__) if not ispkg)
 
 
+@lru_cache(maxsize=None)
 def find_class_in_module(module_name: str, class_name: str):
     """
     :param module_name: full class name. F.e. catcher_modules.database.postgres
     :param class_name: class to search for. F.e. postgres
-    :return: found class or None
+    :return: found class or None. Module is imported only on the first call, result is cached.
     """
-    for name, obj in inspect.getmembers(sys.modules[module_name]):
+    module = importlib.import_module(module_name)
+    for obj in vars(module).values():
         if inspect.isclass(obj) and obj.__name__.lower() == class_name:
             return obj
     return None
+
+
+def find_service(pkg_name, service: str):
+    """
+    :param pkg_name: imported package. F.e. catcher_modules.database
+    :param service: service name, which is the same as module and class name. F.e. postgres
+    :return: service's class or None, if there is no such service in the package.
+    """
+    if service not in list_modules_in_package(pkg_name):
+        return None
+    return find_class_in_module(pkg_name.__name__ + '.' + service, service)
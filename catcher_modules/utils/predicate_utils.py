@@ -0,0 +1,161 @@
+import re
+from typing import Callable, List, Tuple
+
+from catcher.utils.misc import fill_template, inject_builtins, try_get_objects
+
+from catcher_modules.utils import generator_utils
+
+EXPRESSION = re.compile(r'^\s*{{(.*?)}}\s*$', re.DOTALL)
+# {{ MESSAGE.a.b }}, {{ MESSAGE['a'][0] }}
+FIELD_PATH = re.compile(r'^\s*{{\s*MESSAGE((?:\.[A-Za-z_][A-Za-z_0-9]*|\[\s*(?:\'[^\']*\'|"[^"]*"|\d+)\s*\])*)\s*}}\s*$')
+PATH_ELEMENT = re.compile(r'\.([A-Za-z_][A-Za-z_0-9]*)|\[\s*(?:\'([^\']*)\'|"([^"]*)"|(\d+))\s*\]')
+# characters, which can be escaped in json (only printable ascii is safe).
+# Strings with them can't be searched in raw message bytes
+JSON_ESCAPED = re.compile(r'[^\x20-\x7e]|["\\/]')
+
+
+def compile_where(where: dict or str or None, variables: dict) -> Tuple[Callable[[any], bool], List[bytes]]:
+    """
+    Compile `where` clause of a check once to evaluate it against many messages.
+    `equals` clauses are compiled to field matchers (`{the: '{{ MESSAGE.a.b }}', is: ...}`) or to jinja
+    expressions, which are evaluated with the message and only the variables they use. `and`, `or` are compiled
+    recursively. Other operators are evaluated by catcher as is.
+
+    :param where: check clause, where message is available as `MESSAGE`.
+    :param variables: step variables. Templates, not depending on the message, are filled once.
+    :return: predicate(message) and byte strings, which must be in the raw message to match. They can be checked
+             before the message is decoded.
+    """
+    if where is None:
+        return lambda message: True, []
+    if isinstance(where, str):
+        return __truthy(where, variables), []
+    [operator] = where.keys()
+    body = where[operator]
+    if operator in ('and', 'or'):
+        compiled = [compile_where(clause, variables) for clause in body]
+        predicates = [predicate for predicate, _ in compiled]
+        if operator == 'and':
+            return lambda message: all(predicate(message) for predicate in predicates), \
+                   [required for _, clause_required in compiled for required in clause_required]
+        return lambda message: any(predicate(message) for predicate in predicates), []
+    if operator == 'equals':
+        if isinstance(body, str):
+            return __truthy(body, variables), []
+        negative = 'is' not in body
+        expected = body['is_not'] if negative else body['is']
+        if not (isinstance(expected, str) and 'MESSAGE' in expected):
+            return __equals(body['the'], fill_template(expected, variables), negative, variables)
+    return __fallback(where, variables), []
+
+
+def __equals(the: str, expected, negative: bool, variables: dict) -> Tuple[Callable[[any], bool], List[bytes]]:
+    path = __field_path(the)
+    required = []
+    if path is not None:
+        def value_of(message):
+            return __get(message, path)
+
+        if not negative and __searchable(expected):
+            required = [str(expected).encode('utf-8')]
+    else:
+        value_of = __rendered(the, variables)
+    if negative:
+        return lambda message: not __equal(value_of(message), expected), required
+    return lambda message: __equal(value_of(message), expected), required
+
+
+def __truthy(source: str, variables: dict) -> Callable[[any], bool]:
+    """
+    Short form of equals: `'{{ MESSAGE.timestamp > 1000 }}'` is the same as `{the: <expression>, is: true}`.
+    """
+    match = EXPRESSION.match(source)
+    if match is None or '{{' in match.group(1):
+        render = __rendered(source, variables)
+        return lambda message: render(message) == True
+    expression = generator_utils.compile_expression(match.group(1))
+    context = __context(source, variables)
+    return lambda message: expression(MESSAGE=message, **context) == True
+
+
+def __rendered(source, variables: dict) -> Callable[[any], any]:
+    """
+    :return: function, which renders the template with the message and converts the result to an object,
+             the same way catcher does.
+    """
+    if not isinstance(source, str):
+        return lambda message: source
+    template = generator_utils.compile_template(source)
+    context = __context(source, variables)
+
+    def render(message):
+        return try_get_objects(template.render(context, MESSAGE=message))
+
+    return render
+
+
+def __context(source: str, variables: dict) -> dict:
+    """
+    Only variables, which are used in the template. So there is no need to copy all the variables for every message.
+    """
+    names = generator_utils.undeclared_variables(source)
+    names.discard('MESSAGE')
+    if not names:
+        return {}
+    builtins = inject_builtins(variables)
+    return {name: builtins[name] for name in names if name in builtins}
+
+
+def __fallback(where: dict, variables: dict) -> Callable[[any], bool]:
+    from catcher.steps.check import Operator
+    operator = Operator.find_operator(where)
+
+    def check(message):
+        context = dict(variables)
+        context['MESSAGE'] = message
+        return operator.operation(context)
+
+    return check
+
+
+def __field_path(source) -> list or None:
+    if not isinstance(source, str):
+        return None
+    match = FIELD_PATH.match(source)
+    if match is None:
+        return None
+    path = []
+    for name, single_quoted, double_quoted, index in PATH_ELEMENT.findall(match.group(1)):
+        if index:
+            path += [int(index)]
+        else:
+            path += [name or single_quoted or double_quoted]
+    return path
+
+
+def __get(message, path: list):
+    value = message
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return ''  # the same as rendered jinja undefined
+    return value
+
+
+def __equal(value, expected) -> bool:
+    if value == expected:
+        return True
+    # rendered value is converted to object by catcher: '1' == 1
+    return isinstance(value, str) and try_get_objects(value) == expected
+
+
+def __searchable(expected) -> bool:
+    """
+    Can the expected value be searched in the raw json message. Strings and ints are serialized as is, if they
+    don't have characters, which are escaped in json.
+    """
+    if isinstance(expected, bool) or not isinstance(expected, (str, int)):
+        return False
+    expected = str(expected)
+    return expected != '' and JSON_ESCAPED.search(expected) is None
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from os.path import join
+
+from catcher.utils.logger import debug, warning
+
+# reflected metadata: (engine url, schema) -> MetaData
+_metadata = {}
+# catalog snapshots: (engine url, schema) -> {table: {columns, keys}}
+_catalogs = {}
+# fingerprints of the last ddl executed via populate: engine url -> sha1
+_fingerprints = {}
+_lock = threading.RLock()
+# reflected metadata is persisted here, if the schema fingerprint is known. Directory is per user and is used only
+# if no one else can write to it: pickles are loaded from it.
+cache_dir = join(tempfile.gettempdir(),
+                 'catcher_modules_reflection_' + (str(os.getuid()) if hasattr(os, 'getuid') else os.getenv('USERNAME', '')))
+
+
+def get_table(engine, table_name: str):
+    """
+    Reflect the table (only this table and tables it references).
+    Reflected metadata is cached per engine url and schema until the schema is invalidated.
+
+    :param engine: sqlalchemy engine.
+    :param table_name: table name. Can be prefixed with schema, f.e. `my_schema.my_table`.
+    :return: sqlalchemy Table.
+    """
+    schema = None
+    if '.' in table_name:
+        [schema, table_name] = table_name.split('.')
+    full_name = table_name if schema is None else schema + '.' + table_name
+    with _lock:
+        metadata = __get_metadata(engine, schema)
+        if full_name not in metadata.tables:
+            debug('Reflecting {}'.format(full_name))
+            metadata.reflect(engine, schema=schema, only=[table_name])
+            __persist(engine, schema, metadata)
+        return metadata.tables[full_name]
+
+
+def get_catalog(engine, schema: str or None, load):
+    """
+    Get description of all tables of the schema. It is loaded once and cached per engine url and schema
+    until the schema is invalidated.
+
+    :param engine: sqlalchemy engine.
+    :param schema: schema name or None for the default one.
+    :param load: function(engine, schema) -> catalog, which loads all the tables with a single query.
+    """
+    key = (__url(engine), schema)
+    with _lock:
+        if key not in _catalogs:
+            debug('Loading catalog of {}'.format(schema or 'default schema'))
+            _catalogs[key] = load(engine, schema)
+        return _catalogs[key]
+
+
+def invalidate(engine, ddl: str = None):
+    """
+    Forget all the metadata reflected for this engine. Should be called after the schema was changed.
+
+    :param engine: sqlalchemy engine.
+    :param ddl: ddl, which was executed. If set - its fingerprint is used for persisting the reflected metadata,
+                so the next run with the same ddl won't need to reflect it again.
+    """
+    url = __url(engine)
+    with _lock:
+        for key in [k for k in _metadata if k[0] == url]:
+            del _metadata[key]
+        for key in [k for k in _catalogs if k[0] == url]:
+            del _catalogs[key]
+        if ddl is not None:
+            _fingerprints[url] = hashlib.sha1(ddl.encode('utf-8')).hexdigest()
+        else:
+            _fingerprints.pop(url, None)
+
+
+def clear():
+    with _lock:
+        _metadata.clear()
+        _catalogs.clear()
+        _fingerprints.clear()
+
+
+def __get_metadata(engine, schema):
+    key = (__url(engine), schema)
+    if key not in _metadata:
+        _metadata[key] = __load(engine, schema)
+    return _metadata[key]
+
+
+def __load(engine, schema):
+    from sqlalchemy import MetaData
+    path = __cache_file(engine, schema)
+    if path is not None and os.path.exists(path) and __secure_cache_dir():
+        try:
+            with open(path, 'rb') as f:
+                debug('Loading reflected metadata from {}'.format(path))
+                return pickle.load(f)
+        except Exception as e:
+            warning('Can\'t load reflected metadata from {}: {}'.format(path, e))
+    return MetaData()
+
+
+def __persist(engine, schema, metadata):
+    path = __cache_file(engine, schema)
+    if path is None or not __secure_cache_dir():
+        return
+    try:
+        with open(path, 'wb') as f:
+            pickle.dump(metadata, f)
+    except Exception as e:
+        warning('Can\'t persist reflected metadata to {}: {}'.format(path, e))
+
+
+def __secure_cache_dir() -> bool:
+    """
+    Create the cache dir, accessible only by the current user, and check no one else owns or can write to it.
+    """
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        if hasattr(os, 'getuid'):
+            stat = os.lstat(cache_dir)  # lstat: symlink is owned by the one who created it
+            if stat.st_uid != os.getuid() or stat.st_mode & 0o077 or os.path.islink(cache_dir):
+                warning('Reflection cache dir {} is not private, metadata won\'t be persisted'.format(cache_dir))
+                return False
+        return True
+    except OSError as e:
+        warning('Can\'t create reflection cache dir {}: {}'.format(cache_dir, e))
+        return False
+
+
+def __cache_file(engine, schema):
+    url = __url(engine)
+    fingerprint = _fingerprints.get(url)
+    if fingerprint is None:
+        return None
+    catalog = __catalog_fingerprint(engine, schema)
+    if catalog is None:
+        return None
+    key = '{}|{}|{}|{}'.format(url, schema, fingerprint, catalog)
+    return join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pickle')
+
+
+def __catalog_fingerprint(engine, schema) -> str or None:
+    """
+    Number of tables and columns in the schema (length of tables ddl on sqlite). The same ddl could be executed
+    against the database, which was changed by someone else, so pickled metadata is valid only for the same catalog.
+
+    :return: fingerprint or None if the catalog can't be queried (metadata won't be persisted then).
+    """
+    from sqlalchemy import inspect, text
+    try:
+        with engine.connect() as connection:
+            if engine.dialect.name == 'sqlite':
+                master = 'sqlite_master' if schema is None else '"{}".sqlite_master'.format(schema)
+                query = text("select count(*), coalesce(sum(length(sql)), 0) from {} where type = 'table'"
+                             .format(master))
+                row = connection.execute(query).first()
+            else:
+                query = text('select count(distinct table_name), count(*) from information_schema.columns '
+                             'where table_schema = :schema')
+                row = connection.execute(query, {'schema': schema or inspect(engine).default_schema_name}).first()
+        return '{}/{}'.format(*row)
+    except Exception as e:
+        debug('Can\'t fingerprint catalog of {}: {}'.format(schema or 'default schema', e))
+        return None
+
+
+def __url(engine) -> str:
+    return engine.url.render_as_string(hide_password=True)
@@ -0,0 +1,118 @@
+import re
+from typing import Iterable, List, Tuple
+
+TYPE_PATTERN = re.compile(r'^\s*([^(]+?)\s*(?:\((.*)\))?\s*$')
+# different names of the same types in different databases
+TYPE_ALIASES = {
+    'int': 'integer',
+    'int4': 'integer',
+    'serial': 'integer',
+    'int8': 'bigint',
+    'bigserial': 'bigint',
+    'int2': 'smallint',
+    'character varying': 'varchar',
+    'varchar2': 'varchar',
+    'nvarchar2': 'nvarchar',
+    'character': 'char',
+    'bpchar': 'char',
+    'decimal': 'numeric',
+    'number': 'numeric',
+    'bool': 'boolean',
+    'float8': 'double precision',
+    'double': 'double precision',
+    'float4': 'real',
+    'timestamp without time zone': 'timestamp',
+    'timestamp with time zone': 'timestamptz',
+    'time without time zone': 'time',
+    'time with time zone': 'timetz'
+}
+
+INFORMATION_SCHEMA_QUERY = """
+    select c.table_name, c.column_name, c.data_type, c.character_maximum_length, c.numeric_precision,
+           c.numeric_scale, case when k.column_name is null then 0 else 1 end
+    from information_schema.columns c
+    left join (select kcu.table_name, kcu.column_name
+               from information_schema.table_constraints tc
+               join information_schema.key_column_usage kcu
+                 on tc.constraint_name = kcu.constraint_name
+                and tc.table_schema = kcu.table_schema
+                and tc.table_name = kcu.table_name
+               where tc.constraint_type = 'PRIMARY KEY' and tc.table_schema = :schema) k
+      on k.table_name = c.table_name and k.column_name = c.column_name
+    where c.table_schema = :schema
+    order by c.table_name, c.ordinal_position
+"""
+
+
+def parse_type(type_name: str) -> Tuple[str, List[int]]:
+    """
+    Parse column type to the canonical name and its arguments. F.e. `character varying(36)` -> (`varchar`, [36]).
+    """
+    match = TYPE_PATTERN.match(str(type_name).lower())
+    if match is None:
+        return str(type_name).lower(), []
+    name = ' '.join(match.group(1).split())
+    args = [int(arg) for arg in match.group(2).split(',') if arg.strip().isdigit()] if match.group(2) else []
+    return TYPE_ALIASES.get(name, name), args
+
+
+def build_catalog(rows: Iterable[tuple]) -> dict:
+    """
+    Group catalog query rows by table.
+
+    :param rows: rows of (table_name, column_name, data_type, length, precision, scale, is_key).
+    :return: {table: {columns: {column: (type, args)}, keys: [key columns]}}.
+    """
+    catalog = {}
+    for table_name, column_name, data_type, length, precision, scale, is_key in rows:
+        table = catalog.setdefault(table_name.lower(), {'columns': {}, 'keys': []})
+        name, args = parse_type(data_type)
+        if not args:
+            if length is not None:
+                args = [int(length)]
+            elif precision is not None:
+                args = [int(precision), int(scale or 0)]
+        table['columns'][column_name.lower()] = (name, args)
+        if is_key:
+            table['keys'] += [column_name.lower()]
+    return catalog
+
+
+def compare_schema(table_name: str, expected: dict, actual: dict or None) -> dict:
+    """
+    Compare expected table description with the one from the catalog.
+    Only types arguments from the expected description are compared: `varchar` matches `varchar(36)`.
+
+    :param table_name: table name.
+    :param expected: {columns: {column: type}, keys: [key columns]}. Both are optional.
+    :param actual: table from the catalog or None, if there is no such table.
+    :return: differences: missing_columns, mismatched types and keys.
+    """
+    if actual is None:
+        return {'missing_tables': [table_name]}
+    diff = {}
+    columns = expected.get('columns', {})
+    if isinstance(columns, list):  # [{name: type}, ...]
+        columns = {k: v for column in columns for k, v in column.items()}
+    for column, column_type in columns.items():
+        if column.lower() not in actual['columns']:
+            diff.setdefault('missing_columns', []).append({'table': table_name, 'column': column})
+            continue
+        expected_name, expected_args = parse_type(column_type)
+        actual_name, actual_args = actual['columns'][column.lower()]
+        if expected_name != actual_name or expected_args != actual_args[:len(expected_args)]:
+            diff.setdefault('mismatched', []).append({'table': table_name,
+                                                      'column': column,
+                                                      'expected': column_type,
+                                                      'actual': __format_type(actual_name, actual_args)})
+    if 'keys' in expected and sorted(k.lower() for k in expected['keys']) != sorted(actual['keys']):
+        diff.setdefault('keys', []).append({'table': table_name,
+                                            'expected': expected['keys'],
+                                            'actual': actual['keys']})
+    return diff
+
+
+def __format_type(name: str, args: List[int]) -> str:
+    if not args:
+        return name
+    return '{}({})'.format(name, ', '.join(str(arg) for arg in args))
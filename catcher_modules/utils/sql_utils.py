@@ -0,0 +1,190 @@
+import re
+from typing import List
+
+DOLLAR_QUOTE = re.compile(r'\$[A-Za-z_0-9]*\$')
+DELIMITER_COMMAND = re.compile(r'^\s*delimiter\s+(\S+)\s*$', re.IGNORECASE)
+MSSQL_BATCH_SEPARATOR = re.compile(r'^\s*go\s*$', re.IGNORECASE)
+ORACLE_BLOCK_START = re.compile(r'^\s*(declare|begin|create\s+(or\s+replace\s+)?'
+                                r'(editionable\s+|noneditionable\s+)?'
+                                r'(procedure|function|package|trigger|type)\b)', re.IGNORECASE)
+# t-sql routines take the rest of the batch
+MSSQL_BLOCK_START = re.compile(r'^\s*(create|alter)\s+(or\s+alter\s+)?(procedure|proc|function|trigger|view)\b',
+                               re.IGNORECASE)
+# routines with begin ... end bodies, which have delimiters inside
+ROUTINE_START = re.compile(r'^\s*create\s+(or\s+replace\s+)?(definer\s*=\s*\S+\s+)?((temp|temporary)\s+)?'
+                           r'(trigger|procedure|function|event)\b', re.IGNORECASE)
+BLOCK_DIALECTS = ['sqlite', 'mysql', 'postgresql']
+WORD = re.compile(r'[A-Za-z_][A-Za-z_0-9]*')
+# end of if/loop/while/repeat, which are not opened with begin
+NOT_BLOCK_END = re.compile(r'\s+(if|loop|while|repeat)\b', re.IGNORECASE)
+# end of case statement: its `case` doesn't open a new block
+END_CASE = re.compile(r'\s+case\b', re.IGNORECASE)
+
+
+def split_statements(sql: str, dialect: str = '') -> List[str]:
+    """
+    Split sql script into separate statements. Delimiters inside quotes, identifiers and comments are ignored.
+
+    * sqlite, mysql, postgres: `begin ... end` bodies of triggers and routines are not split.
+    * postgres: dollar-quoted strings (function bodies) and `E'...'` strings with backslash escapes are not split.
+    * mysql: `#` comments, backtick identifiers and `DELIMITER` command are supported.
+    * mssql: if script has `GO` separators - it is split by them only. Routines and views take the rest of the
+      script, as they do in a batch.
+    * oracle: PL/SQL blocks end with `/` on a separate line, other statements are returned without trailing `;`.
+
+    :param sql: script to split.
+    :param dialect: sqlalchemy dialect name, f.e. `postgresql` or `mysql+pymysql`.
+    :return: non-empty statements.
+    """
+    dialect = dialect.split('+')[0].lower()
+    if dialect == 'mssql' and any(MSSQL_BATCH_SEPARATOR.match(line) for line in sql.splitlines()):
+        return __split_lines(sql, MSSQL_BATCH_SEPARATOR)
+    if dialect == 'oracle':
+        return __split_oracle(sql)
+    if dialect == 'mssql':
+        return __split(sql, dialect, block_start=MSSQL_BLOCK_START)
+    return __split(sql, dialect)
+
+
+def __split(sql: str, dialect: str, delimiter: str = ';', block_start=None) -> List[str]:
+    """
+    :param block_start: statements, starting with this pattern, are not split till the end of the sql.
+    """
+    statements = []
+    current = ''
+    depth = 0  # of begin ... end blocks
+    i = 0
+    while i < len(sql):
+        if dialect == 'mysql' and (i == 0 or sql[i - 1] == '\n'):
+            line_end = sql.find('\n', i)
+            line_end = len(sql) if line_end == -1 else line_end
+            command = DELIMITER_COMMAND.match(sql[i:line_end])
+            if command:
+                statements += [current]
+                current = ''
+                delimiter = command.group(1)
+                i = line_end + 1
+                continue
+        end = __skip_token(sql, i, dialect)
+        if end > i:
+            current += sql[i:end]
+            i = end
+        elif sql.startswith(delimiter, i) and depth == 0 \
+                and not (block_start and block_start.match(__strip_comments(current))):
+            statements += [current]
+            current = ''
+            i += len(delimiter)
+        elif WORD.match(sql, i) and not __in_identifier(sql, i):
+            word = WORD.match(sql, i).group(0)
+            keyword = word.lower()
+            if keyword in ('begin', 'case') and dialect in BLOCK_DIALECTS \
+                    and ROUTINE_START.match(__strip_comments(current)):
+                depth += 1
+            elif keyword == 'end' and depth > 0 and not NOT_BLOCK_END.match(sql, i + len(word)):
+                depth -= 1
+                end_case = END_CASE.match(sql, i + len(word))
+                if end_case:
+                    word = sql[i:end_case.end()]
+            current += word
+            i += len(word)
+        else:
+            current += sql[i]
+            i += 1
+    statements += [current]
+    return [s.strip() for s in statements if __has_code(s, dialect)]
+
+
+def __skip_token(sql: str, i: int, dialect: str) -> int:
+    """
+    :return: end of quoted string, identifier or comment, which starts at i. Or i if there is no such token.
+    """
+    char = sql[i]
+    if char in ("'", '"') or (char == '`' and dialect == 'mysql'):
+        return __skip_quoted(sql, i, dialect == 'mysql')
+    if char in ('e', 'E') and dialect == 'postgresql' and sql.startswith("'", i + 1) \
+            and not __in_identifier(sql, i):  # E'it\'s' - string with backslash escapes
+        return __skip_quoted(sql, i + 1, True)
+    if sql.startswith('--', i) or (char == '#' and dialect == 'mysql'):
+        end = sql.find('\n', i)
+        return len(sql) if end == -1 else end
+    if sql.startswith('/*', i):
+        end = sql.find('*/', i + 2)
+        return len(sql) if end == -1 else end + 2
+    if char == '$' and dialect == 'postgresql':
+        tag = DOLLAR_QUOTE.match(sql, i)
+        if tag and not __in_identifier(sql, i):
+            end = sql.find(tag.group(0), tag.end())
+            return len(sql) if end == -1 else end + len(tag.group(0))
+    return i
+
+
+def __skip_quoted(sql: str, i: int, backslash_escapes: bool) -> int:
+    """
+    :return: end of the string or identifier, which is quoted with the character at i.
+    """
+    quote = sql[i]
+    end = i + 1
+    while end < len(sql):
+        if sql[end] == '\\' and backslash_escapes:
+            end += 2
+            continue
+        if sql[end] == quote:
+            if sql.startswith(quote, end + 1):  # escaped by doubling
+                end += 2
+                continue
+            return end + 1
+        end += 1
+    return len(sql)
+
+
+def __in_identifier(sql: str, i: int) -> bool:
+    return i > 0 and (sql[i - 1].isalnum() or sql[i - 1] in ('_', '$'))
+
+
+def __has_code(statement: str, dialect: str) -> bool:
+    i = 0
+    while i < len(statement):
+        if statement[i].isspace():
+            i += 1
+            continue
+        end = __skip_token(statement, i, dialect)
+        if end > i and (statement.startswith('--', i) or statement.startswith('/*', i) or statement[i] == '#'):
+            i = end
+            continue
+        return True
+    return False
+
+
+def __split_lines(sql: str, separator) -> List[str]:
+    statements = []
+    current = []
+    for line in sql.splitlines():
+        if separator.match(line):
+            statements += ['\n'.join(current)]
+            current = []
+        else:
+            current += [line]
+    statements += ['\n'.join(current)]
+    return [s.strip() for s in statements if __has_code(s, '')]
+
+
+def __split_oracle(sql: str) -> List[str]:
+    """
+    Oracle doesn't accept trailing `;` in sql statements, but requires it in PL/SQL blocks.
+    """
+    statements = []
+    for chunk in __split_lines(sql, re.compile(r'^\s*/\s*$')):
+        statements += __split(chunk, 'oracle', block_start=ORACLE_BLOCK_START)
+    return statements
+
+
+def __strip_comments(statement: str) -> str:
+    i = 0
+    while i < len(statement):
+        if statement[i].isspace():
+            i += 1
+        elif statement.startswith('--', i) or statement.startswith('/*', i):
+            i = __skip_token(statement, i, '')
+        else:
+            break
+    return statement[i:]
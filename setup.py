@@ -32,7 +32,10 @@ def extras() -> dict:
         'marketo': ["marketorestpython==0.5.14"],
         'airflow': ["cryptography==36.0.1"],
         'selenium': ["selenium==4.1.0"],
-        'salesforce': ["simple-salesforce==1.11.4"]
+        'salesforce': ["simple-salesforce==1.11.4"],
+        'parquet': ["pyarrow==10.0.1"],
+        'avro': ["pyarrow==10.0.1", "fastavro==1.7.0"],
+        'async': ["sqlalchemy==1.4.29", "greenlet==1.1.2", "asyncpg==0.25.0", "aiomysql==0.0.22", "aiosqlite==0.17.0"]
     }
     modules['all'] = list(set([item for sublist in modules.values() for item in sublist]))
     # don't try to install couchbase in CI/CD
@@ -0,0 +1,159 @@
+import sqlite3
+from os.path import join
+
+import test
+from catcher.core.runner import Runner
+from catcher.utils.file_utils import ensure_empty
+
+from catcher_modules.exceptions.data_exceptions import DataMismatchException, MultipleFailuresException
+from catcher_modules.service.comparator.avro_comparator import AvroComparator
+from catcher_modules.service.comparator.csv_comparator import CsvComparator
+from catcher_modules.service.expect import Expect
+from test.abs_test_class import TestClass
+
+
+class ComparatorTest(TestClass):
+    def __init__(self, method_name):
+        super().__init__('comparator', method_name)
+
+    @property
+    def resources(self):
+        return join(self.test_dir, 'resources')
+
+    def setUp(self):
+        super().setUp()
+        ensure_empty(join(test.get_test_dir(self.test_name), 'resources'))
+        self.populate_file('resources/expected.csv', "id,name,price\n"
+                                                     "1,foo,1.5\n"
+                                                     "2,bar,2.5\n"
+                                                     "3,baz,\n")
+
+    def test_compare_csv_with_key(self):
+        self.populate_file('resources/actual.csv', "id,name,price\n"
+                                                   "3,baz,\n"
+                                                   "2,bar,2.51\n"
+                                                   "1,foo,1.5\n")
+        self.populate_file('main.yaml', '''---
+            steps:
+                - expect:
+                    compare:
+                        csv:
+                            expected: expected.csv
+                            actual: actual.csv
+                            key: id
+                            tolerance: {price: 0.05}
+            ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
+    def test_compare_csv_report(self):
+        self.populate_file('resources/actual.csv', "id,name,price\n"
+                                                   "1,foo,1.5\n"
+                                                   "2,BAR,2.5\n"
+                                                   "4,new,4\n")
+        with self.assertRaises(DataMismatchException) as error:
+            CsvComparator(expected='expected.csv', actual='actual.csv', key='id') \
+                .check({'RESOURCES_DIR': self.resources})
+        diff = error.exception.diff
+        self.assertEqual([{'id': 3, 'name': 'baz', 'price': None}], diff['missing'])
+        self.assertEqual([{'id': 4, 'name': 'new', 'price': 4.0}], diff['extra'])
+        self.assertEqual([{'key': {'id': 2}, 'column': 'name', 'expected': 'bar', 'actual': 'BAR'}], diff['mismatched'])
+
+    def test_compare_csv_without_key(self):
+        self.populate_file('resources/actual.csv', "id,name,updated\n"
+                                                   "3,baz,1\n"
+                                                   "1,foo,2\n"
+                                                   "1,foo,3\n")
+        with self.assertRaises(DataMismatchException) as error:
+            CsvComparator(expected='expected.csv', actual='actual.csv', ignore=['price']) \
+                .check({'RESOURCES_DIR': self.resources})
+        diff = error.exception.diff
+        self.assertEqual([{'row': {'id': '2', 'name': 'bar'}, 'count': 1}], diff['missing'])
+        self.assertEqual([{'row': {'id': '1', 'name': 'foo'}, 'count': 1}], diff['extra'])
+
+    def test_compare_parquet_with_sql(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        db_file = join(self.test_dir, 'test.db')
+        with sqlite3.connect(db_file) as conn:
+            conn.execute('create table test(id integer primary key, name text)')
+            conn.execute("insert into test values(1, 'foo'), (2, 'bar')")
+        pq.write_table(pa.table({'id': [1, 2], 'name': ['foo', 'bar']}), join(self.resources, 'expected.parquet'))
+        self.populate_file('main.yaml', '''---
+            steps:
+                - expect:
+                    compare:
+                        parquet:
+                            expected: expected.parquet
+                            actual:
+                                sql:
+                                    type: sqlite
+                                    conf: '/{}'
+                                    query: 'select * from test'
+                            key: id
+            '''.format(db_file))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
+    def test_expect_keeps_all_diffs(self):
+        db_file = join(self.test_dir, 'test.db')
+        with sqlite3.connect(db_file) as conn:
+            conn.execute('create table test(id integer primary key, name text)')
+            conn.execute("insert into test values(1, 'foo')")
+        self.populate_file('resources/test.csv', "id,name\n"
+                                                 "2,bar\n")
+        self.populate_file('resources/actual.csv', "id,name,price\n"
+                                                   "1,foo,1.5\n"
+                                                   "2,bar,2.5\n")
+        with self.assertRaises(MultipleFailuresException) as error:
+            Expect(compare={'sqlite': {'conf': '/' + db_file, 'data': {'test': 'test.csv'}},
+                            'csv': {'expected': 'expected.csv', 'actual': 'actual.csv', 'key': 'id'}}) \
+                .action({}, {'RESOURCES_DIR': self.resources})
+        self.assertEqual({'sqlite', 'csv'}, set(error.exception.errors.keys()))
+        self.assertEqual([{'id': '2', 'name': 'bar'}], error.exception.diff['sqlite']['missing'])
+        self.assertEqual([{'id': 3, 'name': 'baz', 'price': None}], error.exception.diff['csv']['missing'])
+
+    def test_compare_sql_types_change_between_batches(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        db_file = join(self.test_dir, 'test.db')
+        prices = [None] * 5000 + [1] * 5000 + [1.5]  # null, then int in the first batch, float in the second
+        with sqlite3.connect(db_file) as conn:
+            conn.execute('create table test(id integer primary key, price)')
+            conn.executemany('insert into test values(?, ?)', enumerate(prices))
+        pq.write_table(pa.table({'id': list(range(len(prices))), 'price': prices}),
+                       join(self.resources, 'expected.parquet'))
+        self.populate_file('main.yaml', '''---
+            steps:
+                - expect:
+                    compare:
+                        parquet:
+                            expected: expected.parquet
+                            actual:
+                                sql:
+                                    type: sqlite
+                                    conf: '/{}'
+                                    query: 'select * from test'
+                            key: id
+            '''.format(db_file))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
+    def test_compare_avro_null_first_batch(self):
+        import fastavro
+        schema = {'type': 'record', 'name': 'test',
+                  'fields': [{'name': 'id', 'type': 'long'}, {'name': 'name', 'type': ['null', 'string']}]}
+        records = [{'id': i, 'name': None if i < 10000 else 'foo'} for i in range(10001)]
+        for name in ['expected.avro', 'actual.avro']:
+            with open(join(self.resources, name), 'wb') as f:
+                fastavro.writer(f, schema, records)
+        AvroComparator(expected='expected.avro', actual='actual.avro', key='id') \
+            .check({'RESOURCES_DIR': self.resources})
+        records[-1]['name'] = 'bar'
+        with open(join(self.resources, 'actual.avro'), 'wb') as f:
+            fastavro.writer(f, schema, records)
+        with self.assertRaises(DataMismatchException) as error:
+            AvroComparator(expected='expected.avro', actual='actual.avro', key='id') \
+                .check({'RESOURCES_DIR': self.resources})
+        self.assertEqual([{'key': {'id': 10000}, 'column': 'name', 'expected': 'foo', 'actual': 'bar'}],
+                         error.exception.diff['mismatched'])
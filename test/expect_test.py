@@ -55,21 +55,29 @@ class ExpectTest(TestClass):
         self.populate_file('resources/check_schema.json', '''
                 {
                     "foo": {
-                        "columns": [
-                            {"user_id": "integer"},
-                            {"email": "varchar(36)}"
-                        ],
+                        "columns": {
+                            "user_id": "integer",
+                            "email": "varchar(36)"
+                        },
                         "keys": ["user_id"]
                     },
                     "bar": {
-                        "columns": [
-                            {"key": "varchar(36)"},
-                            {"value": "varchar(36)"}
-                        ],
-                        "keys": ["key"]
+                        "columns": {
+                            "key": "varchar(36)",
+                            "value": "varchar"
+                        }
                     }
                 }''')  # TODO add index on value and check it.
-        pass
+        self.populate_file('main.yaml', '''---
+            steps:
+                - expect:
+                    compare:
+                        postgres:
+                            conf: 'test:test@localhost:5433/test'
+                            schema: check_schema.json
+            ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
 
     def test_expect(self):
         self.populate_file('resources/foo.csv', "user_id,email\n"
@@ -111,6 +119,20 @@ class ExpectTest(TestClass):
         runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
         self.assertFalse(runner.run_tests())
 
+    def test_expect_false_positive_many_rows(self):
+        rows = ''.join('{},test{}@test.com\n'.format(i, i) for i in range(3, 20000))
+        self.populate_file('resources/foo.csv', "user_id,email\n1,test1@test.com\n" + rows)
+        self.populate_file('main.yaml', '''---
+                    steps:
+                        - expect:
+                            compare:
+                                postgres:
+                                    conf: 'test:test@localhost:5433/test'
+                                    data: {foo: foo.csv}
+                    ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertFalse(runner.run_tests())
+
     def test_expect_strict(self):
         self.populate_file('resources/foo.csv', "user_id,email\n"
                                                 "1,test1@test.com\n"
@@ -231,3 +253,74 @@ class ExpectTest(TestClass):
         runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
         self.assertTrue(runner.run_tests())
 
+    def test_expect_checksum(self):
+        self.populate_file('resources/foo.csv', "user_id,email\n"
+                                                "2,test2@test.com\n"
+                                                "1,test1@test.com\n"
+                           )
+        self.populate_file('main.yaml', '''---
+            steps:
+                - expect:
+                    compare:
+                        postgres:
+                            conf: 'test:test@localhost:5433/test'
+                            data:
+                                foo: foo.csv
+                            checksum:
+                                key: user_id
+                                chunk_size: 1
+            ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
+    def test_expect_checksum_false_positive(self):
+        self.populate_file('resources/foo.csv', "user_id,email\n"
+                                                "1,test1@test.com\n"
+                                                "2,WRONG_DATA\n"
+                           )
+        self.populate_file('main.yaml', '''---
+            steps:
+                - expect:
+                    compare:
+                        postgres:
+                            conf: 'test:test@localhost:5433/test'
+                            data:
+                                foo: foo.csv
+                            checksum:
+                                key: user_id
+            ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertFalse(runner.run_tests())
+
+    def test_expect_checksum_null_key(self):
+        with self.connection as conn:
+            cur = conn.cursor()
+            cur.execute("CREATE TABLE baz(id integer, name varchar(36)); "
+                        "insert into baz values(1, 'a'), (null, 'b'), (null, 'c');")
+            conn.commit()
+            cur.close()
+        try:
+            self.populate_file('resources/baz.csv', "id,name\n"
+                                                    "1,a\n"
+                                                    ",b\n"
+                                                    ",d\n"
+                               )
+            self.populate_file('main.yaml', '''---
+                steps:
+                    - expect:
+                        compare:
+                            postgres:
+                                conf: 'test:test@localhost:5433/test'
+                                data:
+                                    baz: baz.csv
+                                checksum:
+                                    key: id
+                ''')
+            runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+            self.assertFalse(runner.run_tests())
+        finally:
+            with self.connection as conn:
+                cur = conn.cursor()
+                cur.execute("DROP TABLE if exists baz;")
+                conn.commit()
+                cur.close()
@@ -1,10 +1,12 @@
 import json
+import time
 from os.path import join
 
 from pykafka import KafkaClient
 from pykafka.common import OffsetType
 
 from catcher.core.runner import Runner
+from catcher_modules.utils import kafka_utils
 from test.abs_test_class import TestClass
 
 
@@ -78,6 +80,36 @@ class KafkaTest(TestClass):
         runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
         self.assertTrue(runner.run_tests())
 
+    def test_consume_since_timestamp(self):
+        self.produce_message({'id': 'uuid1'}, 'test_consume_since_timestamp', broker_version='1.0.0')
+        time.sleep(0.1)
+        started = int(time.time() * 1000)
+        time.sleep(0.1)
+        self.produce_message({'id': 'uuid2'}, 'test_consume_since_timestamp', broker_version='1.0.0')
+        self.populate_file('main.yaml', '''---
+            steps:
+                - kafka:
+                    consume:
+                        server: '127.0.0.1:9092'
+                        topic: 'test_consume_since_timestamp'
+                        broker_version: '1.0.0'
+                        timestamp: {}
+                    register: {{uuid: '{{{{ OUTPUT.id }}}}'}}
+                - check:
+                    equals: {{the: '{{{{ uuid }}}}', is: 'uuid2'}}
+                - kafka:
+                    consume:
+                        server: '127.0.0.1:9092'
+                        group_id: 'v0'
+                        topic: 'test_consume_since_timestamp'
+                        timestamp: '2100-01-01T00:00:00'
+                    register: {{uuid: '{{{{ OUTPUT.id }}}}'}}
+                - check:
+                    equals: {{the: '{{{{ uuid }}}}', is: 'uuid1'}}
+            '''.format(started))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
     def test_produce_message(self):
         self.populate_file('main.yaml', '''---
             steps:
@@ -107,6 +139,125 @@ class KafkaTest(TestClass):
         msg = self.consume_message('test_produce_json')
         self.assertEqual({'key1': 'value1', 'key2': [1, 2, 3, 4]}, json.loads(msg))
 
+    def test_produce_reuses_client(self):
+        self.populate_file('main.yaml', '''---
+            steps:
+                - loop:
+                    foreach:
+                        in: '{{ range(10) | list }}'
+                        do:
+                            kafka:
+                                produce:
+                                    server: '127.0.0.1:9092'
+                                    topic: 'test_produce_reuses_client'
+                                    data: '{{ ITEM }}'
+            ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertEqual(1, len(kafka_utils._clients))
+        self.assertIs(kafka_utils.get_producer(self.server, 'test_produce_reuses_client'),
+                      kafka_utils.get_producer(self.server, 'test_produce_reuses_client'))
+        self.assertEqual('0', self.consume_message('test_produce_reuses_client'))
+
+    def test_produce_bulk(self):
+        self.populate_file('resources/messages.jsonl', '{"id": 1}\n{"id": 2}\n')
+        self.populate_file('main.yaml', '''---
+            steps:
+                - kafka:
+                    produce:
+                        server: '127.0.0.1:9092'
+                        topic: 'test_produce_bulk'
+                        messages:
+                            - {'id': 0}
+                        messages_from_file: messages.jsonl
+                        generate:
+                            template: '{"id": {{ INDEX + 3 }}}'
+                            count: 1000
+                        compression: gzip
+                    register: {report: '{{ OUTPUT }}'}
+                - check:
+                    equals: {the: '{{ report.count }}', is: 1003}
+                - check:
+                    equals: {the: '{{ report.failed }}', is: 0}
+                - check: '{{ report.latency_ms.p99 >= report.latency_ms.p50 }}'
+            ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertEqual({'id': 0}, json.loads(self.consume_message('test_produce_bulk')))
+
+    def test_consume_returns_on_match(self):
+        self.produce_message({'id': 'uuid1'}, 'test_consume_returns_on_match')
+        self.populate_file('main.yaml', '''---
+            steps:
+                - kafka:
+                    consume:
+                        server: '127.0.0.1:9092'
+                        topic: 'test_consume_returns_on_match'
+                        timeout: {seconds: 30}
+                        fetch_wait_max_ms: 10
+                    register: {uuid: '{{ OUTPUT.id }}'}
+                - check:
+                    equals: {the: '{{ uuid }}', is: 'uuid1'}
+            ''')
+        started = time.monotonic()
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_consume_count(self):
+        for i in range(6):
+            self.produce_message(json.dumps({'id': i, 'even': i % 2 == 0}).encode('utf-8'), 'test_consume_count')
+        self.populate_file('main.yaml', '''---
+            steps:
+                - kafka:
+                    consume:
+                        server: '127.0.0.1:9092'
+                        topic: 'test_consume_count'
+                        count: 2
+                        where:
+                            equals: {the: '{{ MESSAGE.even }}', is: true}
+                    register: {first: '{{ OUTPUT }}'}
+                - check:
+                    equals: {the: '{{ first | map(attribute="id") | list }}', is: [0, 2]}
+                - kafka:
+                    consume:
+                        server: '127.0.0.1:9092'
+                        topic: 'test_consume_count'
+                        offset: earliest
+                        count: all
+                        num_consumer_fetchers: 2
+                        timeout: {seconds: 5}
+                    register: {all: '{{ OUTPUT }}'}
+                - check:
+                    equals: {the: '{{ all | length }}', is: 6}
+            ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
+    def test_consume_with_prefilter(self):
+        for i in range(5):
+            status = 'paid' if i == 3 else 'new'
+            self.produce_message({'order': {'id': i}, 'status': status}, 'test_consume_with_prefilter')
+        self.populate_file('main.yaml', '''---
+            variables:
+                order_id: 3
+            steps:
+                - kafka:
+                    consume:
+                        server: '127.0.0.1:9092'
+                        topic: 'test_consume_with_prefilter'
+                        prefilter: 'paid'
+                        where:
+                            and:
+                                - equals: {the: '{{ MESSAGE.order.id }}', is: '{{ order_id }}'}
+                                - equals: '{{ MESSAGE.status in ["paid", "refunded"] }}'
+                    register: {order: '{{ OUTPUT }}'}
+                - check:
+                    equals: {the: '{{ order.order.id }}', is: 3}
+            ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
     def test_skip_same_message(self):
         self.produce_message({'id': 'uuid1'}, 'test_skip_same_message')
         self.produce_message({'id': 'uuid2'}, 'test_skip_same_message')
@@ -130,8 +281,8 @@ class KafkaTest(TestClass):
         runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
         self.assertTrue(runner.run_tests())
 
-    def produce_message(self, message: bytes or dict, topic='test'):
-        client = KafkaClient(hosts=self.server)
+    def produce_message(self, message: bytes or dict, topic='test', broker_version='0.9.0'):
+        client = KafkaClient(hosts=self.server, broker_version=broker_version)
         topic = client.topics[topic.encode('utf-8')]
         if not isinstance(message, bytes):
             message = str(message).encode('utf-8')
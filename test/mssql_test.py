@@ -145,6 +145,39 @@ class MSSqlTest(TestClass):
         self.assertEqual(2, response[1][0])
         self.assertEqual('test2@test.com', response[1][1])
 
+    def test_execute_script_procedure(self):
+        self.populate_file('resources/script.sql', '''
+                CREATE TABLE foo(
+                    user_id      integer    primary key,
+                    email        varchar(36)    NOT NULL
+                );
+                CREATE PROCEDURE add_user @id integer AS
+                BEGIN
+                    insert into foo values (@id, 'test1@test.com');
+                    insert into foo values (@id + 1, 'test2@test.com');
+                END;
+                ''')
+
+        self.populate_file('main.yaml', '''---
+                    steps:
+                        - mssql:
+                            request:
+                                conf: 'sa:Test1234@localhost:1433/tempdb?driver=ODBC+Driver+17+for+SQL+Server'
+                                sql: script.sql
+                                script: true
+                            register: {statements: '{{ OUTPUT | length }}'}
+                        - check:
+                            equals: {the: '{{ statements }}', is: 2}
+                        - mssql:
+                            request:
+                                conf: 'sa:Test1234@localhost:1433/tempdb?driver=ODBC+Driver+17+for+SQL+Server'
+                                query: 'exec add_user 1; drop procedure add_user'
+                    ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        response = self.get_values('foo')
+        self.assertEqual(2, len(response))
+
     def test_expect_strict(self):
         self.populate_schema_file()
         self.populate_data_file()
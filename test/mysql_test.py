@@ -181,6 +181,34 @@ class MySqlTest(TestClass):
         response = self.get_values('foo')
         self.assertEqual([(2, 'test2@test.org')], response)
 
+    def test_execute_script_procedure(self):
+        self.populate_file('resources/script.sql', '''
+                                        CREATE TABLE if not exists foo(
+                                            user_id      integer    primary key,
+                                            email        varchar(36)    NOT NULL
+                                        );
+                                        DROP PROCEDURE IF EXISTS add_user;
+                                        CREATE PROCEDURE add_user(id integer)
+                                        BEGIN
+                                            IF id > 0 THEN
+                                                insert into foo values (id, concat('test', id, '@test.org'));
+                                            END IF;
+                                        END;
+                                        CALL add_user(1);
+                                        ''')
+        self.populate_file('main.yaml', '''---
+                                    steps:
+                                        - mysql:
+                                            request:
+                                                conf: 'root:test@localhost:3307/test'
+                                                sql: script.sql
+                                                script: true
+                                    ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        response = self.get_values('foo')
+        self.assertEqual([(1, 'test1@test.org')], response)
+
     def test_expect_strict(self):
         self.populate_schema_file()
         self.populate_data_file()
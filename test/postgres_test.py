@@ -6,6 +6,8 @@ from os.path import join
 import psycopg2
 from catcher.core.runner import Runner
 
+from catcher_modules.database.postgres import Postgres
+
 from test.abs_test_class import TestClass
 
 
@@ -192,6 +194,57 @@ class PostgresTest(TestClass):
         response = self.get_values('foo')
         self.assertEqual([(2, 'test2@test.org')], response)
 
+    def test_execute_script_escapes(self):
+        self.populate_file('resources/script.sql', '''
+                                CREATE TABLE if not exists foo(
+                                    user_id      integer    primary key,
+                                    email        varchar(36)    NOT NULL
+                                );
+                                insert into foo values (1, E'it\\'s; x');
+                                insert into foo values (2, $$a;b$$);
+                                ''')
+        self.populate_file('main.yaml', '''---
+                                    steps:
+                                        - postgres:
+                                            request:
+                                                conf: 'test:test@localhost:5433/test'
+                                                sql: script.sql
+                                                script: true
+                                            register: {statements: '{{ OUTPUT | length }}'}
+                                        - check:
+                                            equals: {the: '{{ statements }}', is: 3}
+                                    ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        response = self.get_values('foo')
+        self.assertEqual([(1, "it's; x"), (2, 'a;b')], response)
+
+    def test_populate_empty_string(self):
+        self.populate_file('resources/schema.sql', '''
+                                CREATE TABLE if not exists foo(
+                                    user_id      integer    primary key,
+                                    email        varchar(36)    NOT NULL,
+                                    name         text
+                                );
+                                ''')
+        self.populate_file('resources/foo.csv', "user_id,email,name\n"
+                                                "1,,\n"
+                                                "2,\"a,\"\"b\"\"\",c\n")
+        self.populate_file('main.yaml', '''---
+                                    steps:
+                                        - prepare:
+                                            populate:
+                                                postgres:
+                                                    conf: 'test:test@localhost:5433/test'
+                                                    schema: schema.sql
+                                                    data:
+                                                        foo: foo.csv
+                                    ''')
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        response = self.get_values('foo')
+        self.assertEqual([(1, '', ''), (2, 'a,"b"', 'c')], response)
+
     def test_populate_sql(self):
         self.populate_file('resources/schema.sql', '''
                                         CREATE TABLE if not exists foo(
@@ -220,6 +273,38 @@ class PostgresTest(TestClass):
         response = self.get_values('foo')
         self.assertEqual([(1, 'test1@test.org'), (2, 'test2@test.org')], response)
 
+    def test_snapshot_restore(self):
+        self.populate_file('main.yaml', '''---
+                                    steps:
+                                        - postgres:
+                                            actions:
+                                                - request:
+                                                    conf: 'test:test@localhost:5433/test'
+                                                    snapshot: seeded
+                                                - request:
+                                                    conf: 'test:test@localhost:5433/test'
+                                                    sql: 'delete from test'
+                                                - request:
+                                                    conf: 'test:test@localhost:5433/test'
+                                                    sql: 'create table foo(id integer)'
+                                                - request:
+                                                    conf: 'test:test@localhost:5433/test'
+                                                    restore: seeded
+                                    ''')
+        try:
+            runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+            self.assertTrue(runner.run_tests())
+            self.assertEqual([(1, 1), (2, 2)], self.get_values('test'))
+            with self.assertRaisesRegex(Exception, 'No snapshot missing'):
+                Postgres(postgres={}).execute({'request': {'conf': 'test:test@localhost:5433/test',
+                                                           'restore': 'missing'}}, {})
+            self.assertEqual([(1, 1), (2, 2)], self.get_values('test'))  # database is not dropped
+        finally:
+            conn = psycopg2.connect("dbname=postgres user=test host=localhost password=test port=5433")
+            conn.autocommit = True
+            conn.cursor().execute('DROP DATABASE IF EXISTS test_snapshot_seeded')
+            conn.close()
+
     def test_uuid(self):
         # write uuid
         self.populate_file('resources/schema.sql', '''
@@ -1,11 +1,17 @@
+import os
 from os.path import join
 import test
 
 import sqlite3
 from catcher.core.runner import Runner
 from catcher.utils.file_utils import ensure_empty
+from catcher_modules.database.sqlite import SQLite
+from catcher_modules.exceptions.data_exceptions import DataMismatchException, SchemaMismatchException
+from catcher_modules.utils import async_utils, dataset_utils, db_utils, generator_utils, reflection_utils, \
+    module_utils, sql_utils
 
 from test.abs_test_class import TestClass
+from test.test_utils import check_file
 
 
 class SQLiteTest(TestClass):
@@ -158,3 +164,514 @@ class SQLiteTest(TestClass):
         runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
         self.assertTrue(runner.run_tests())
 
+    def test_engine_reused(self):
+        conf = '/' + join(self.test_dir, "test.db")
+        self.assertIs(db_utils.get_engine(conf, 'sqlite'), db_utils.get_engine(conf, 'sqlite'))
+        self.assertIsNot(db_utils.get_engine(conf, 'sqlite'), db_utils.get_engine(conf + '2', 'sqlite'))
+        pooled = {'url': conf, 'pool_pre_ping': True}
+        self.assertIs(db_utils.get_engine(pooled, 'sqlite'), db_utils.get_engine(dict(pooled), 'sqlite'))
+        self.assertIsNot(db_utils.get_engine(conf, 'sqlite'), db_utils.get_engine(pooled, 'sqlite'))
+
+    def test_populate_batches(self):
+        self.populate_schema_file()
+        self.populate_file('resources/foo.csv', "user_id,email\n" +
+                           ''.join('{},test{}@test.com\n'.format(i, i) for i in range(1, 6)))
+        self.populate_file('main.yaml', '''---
+                            steps:
+                                - prepare:
+                                    populate:
+                                        sqlite:
+                                            conf: '/{}'
+                                            schema: schema.sql
+                                            batch_size: 2
+                                            data:
+                                                foo: foo.csv
+                            '''.format(join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        response = self.get_values('foo')
+        self.assertEqual([(i, 'test{}@test.com'.format(i)) for i in range(1, 6)], response)
+
+    def test_populate_types(self):
+        self.populate_file('resources/schema.sql', "create table typed(id integer primary key, price numeric(10, 2), "
+                                                   "rate float, created date, updated timestamp, info json);")
+        self.populate_file('resources/typed.csv', "id,price,rate,created,updated,info\n"
+                                                  "1,10.50,0.5,2020-01-02,2020-01-02T10:20:30,\"{\"\"a\"\": 1}\"\n"
+                                                  "2,,,,,\n")
+        self.populate_file('main.yaml', '''---
+                            steps:
+                                - prepare:
+                                    populate:
+                                        sqlite:
+                                            conf: '/{}'
+                                            schema: schema.sql
+                                            data:
+                                                typed: typed.csv
+                            '''.format(join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        response = self.get_values('typed')
+        self.assertEqual([(1, 10.5, 0.5, '2020-01-02', '2020-01-02 10:20:30.000000', '{"a": 1}'),
+                          (2, None, None, None, None, 'null')], response)  # sqlalchemy's JSON default
+
+    def test_reflection_cached(self):
+        engine = db_utils.get_engine('/' + join(self.test_dir, "test.db"), 'sqlite')
+        table = reflection_utils.get_table(engine, 'test')
+        self.assertIs(table, reflection_utils.get_table(engine, 'test'))
+        reflection_utils.invalidate(engine)
+        self.assertIsNot(table, reflection_utils.get_table(engine, 'test'))
+        self.assertEqual(['id', 'num'], [c.name for c in reflection_utils.get_table(engine, 'test').columns])
+
+    def test_reflection_not_persisted_to_shared_dir(self):
+        engine = db_utils.get_engine('/' + join(self.test_dir, "test.db"), 'sqlite')
+        cache_dir = reflection_utils.cache_dir
+        reflection_utils.cache_dir = join(self.test_dir, 'reflection')
+        try:
+            os.makedirs(reflection_utils.cache_dir)
+            os.chmod(reflection_utils.cache_dir, 0o777)
+            reflection_utils.invalidate(engine, 'create table test')
+            reflection_utils.get_table(engine, 'test')
+            self.assertEqual([], os.listdir(reflection_utils.cache_dir))
+            os.chmod(reflection_utils.cache_dir, 0o700)
+            reflection_utils.invalidate(engine, 'create table test')
+            reflection_utils.get_table(engine, 'test')
+            self.assertEqual(1, len(os.listdir(reflection_utils.cache_dir)))
+        finally:
+            reflection_utils.invalidate(engine)
+            reflection_utils.cache_dir = cache_dir
+
+    def test_reflection_not_loaded_for_changed_catalog(self):
+        engine = db_utils.get_engine('/' + join(self.test_dir, "test.db"), 'sqlite')
+        cache_dir = reflection_utils.cache_dir
+        reflection_utils.cache_dir = join(self.test_dir, 'reflection')
+        try:
+            reflection_utils.invalidate(engine, 'create table test')
+            reflection_utils.get_table(engine, 'test')
+            with self.connection as conn:  # changed outside of catcher, the same ddl is executed next time
+                conn.execute("alter table test add column name text;")
+            reflection_utils.invalidate(engine, 'create table test')
+            self.assertEqual(['id', 'num', 'name'], [c.name for c in reflection_utils.get_table(engine, 'test').columns])
+        finally:
+            reflection_utils.invalidate(engine)
+            reflection_utils.cache_dir = cache_dir
+
+    def test_expect_empty_file(self):
+        self.populate_file('resources/test.csv', "")
+        with self.assertRaisesRegex(Exception, 'No header in test.csv'):
+            SQLite(sqlite={}).expect({'RESOURCES_DIR': join(self.test_dir, 'resources')},
+                                     conf='/' + join(self.test_dir, "test.db"), data={'test': 'test.csv'})
+
+    def test_expect_missing_rows(self):
+        self.populate_file('resources/test.csv', "id,num\n"
+                                                 "1,1\n"
+                                                 "2,3\n"
+                                                 "2,2\n"
+                                                 "4,4\n")
+        db_file = join(self.test_dir, "test.db")
+        self.populate_file('main.yaml', '''---
+                                    steps:
+                                        - expect:
+                                            compare:
+                                                sqlite:
+                                                    conf: '/{}'
+                                                    data:
+                                                        test: test.csv
+                                    '''.format(db_file))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertFalse(runner.run_tests())
+        with self.assertRaises(DataMismatchException) as error:
+            SQLite(sqlite={}).expect({'RESOURCES_DIR': join(self.test_dir, 'resources')},
+                                     conf='/' + db_file, data={'test': 'test.csv'})
+        self.assertEqual([{'id': '2', 'num': '3'}, {'id': '4', 'num': '4'}], error.exception.diff['missing'])
+
+    def test_expect_missing_rows_many_chunks(self):
+        with self.connection as conn:
+            conn.executemany("insert into test(id, num) values(?, ?);", [(i, i) for i in range(3, 2000)])
+        rows = ''.join('{},{}\n'.format(i, i) for i in range(1, 2000) if i % 700 != 0)
+        self.populate_file('resources/test.csv', "id,num\n" + rows + "700,1\n1999,0\n")
+        with self.assertRaises(DataMismatchException) as error:
+            SQLite(sqlite={}).expect({'RESOURCES_DIR': join(self.test_dir, 'resources')},
+                                     conf='/' + join(self.test_dir, "test.db"), data={'test': 'test.csv'})
+        self.assertEqual([{'id': '700', 'num': '1'}, {'id': '1999', 'num': '0'}], error.exception.diff['missing'])
+
+    def test_execute_script(self):
+        self.populate_file('resources/script.sql', '''
+            create table other(id integer, name text); -- comment; with delimiter
+            insert into other values(1, 'a;b'), (2, 'c');
+            /* update; */
+            update other set name = 'd' where id = 2;
+            select * from other;
+            ''')
+        result = SQLite(sqlite={}).execute({'request': {'conf': '/' + join(self.test_dir, "test.db"),
+                                                        'sql': 'script.sql',
+                                                        'script': True}},
+                                           {'RESOURCES_DIR': join(self.test_dir, 'resources')})
+        self.assertEqual(4, len(result))
+        self.assertEqual([2, 1, 2], [r['rowcount'] for r in result[1:]])
+        self.assertEqual([{'id': 1, 'name': 'a;b'}, {'id': 2, 'name': 'd'}], result[3]['rows'])
+        self.assertTrue(all(r['time'] >= 0 for r in result))
+
+    def test_populate_script_trigger(self):
+        self.populate_file('resources/schema.sql', '''
+            create table foo(user_id integer primary key, email text, updated integer default 0);
+            create trigger foo_updated after update of email on foo
+            begin
+                update foo set updated = updated + 1 where user_id = new.user_id;
+                select case when new.email = '' then raise(abort, 'empty; email') end;
+            end;
+            insert into foo(user_id, email) values (1, 'a;b');
+            update foo set email = 'c' where user_id = 1;
+            ''')
+        conf = '/' + join(self.test_dir, "test.db")
+        SQLite(sqlite={}).populate({'RESOURCES_DIR': join(self.test_dir, 'resources')},
+                                   conf=conf, schema='schema.sql', script=True)
+        response = SQLite(sqlite={}).execute({'request': {'conf': conf, 'sql': 'select * from foo'}}, {})
+        self.assertEqual({'user_id': 1, 'email': 'c', 'updated': 1}, response)
+
+    def test_split_end_case(self):
+        body = '''CREATE PROCEDURE p(x integer)
+BEGIN
+    CASE x WHEN 1 THEN select 1; ELSE select case when x > 2 then 3 end; END CASE;
+END'''
+        self.assertEqual([body, 'select 4', 'select 5'],
+                         sql_utils.split_statements('DELIMITER //\n' + body + '//\nDELIMITER ;\nselect 4;\nselect 5;',
+                                                    'mysql+pymysql'))
+        self.assertEqual([body, 'select 4', 'select 5'],
+                         sql_utils.split_statements(body + ';\nselect 4;\nselect 5;', 'mysql+pymysql'))
+        trigger = '''create trigger t after insert on test
+begin
+    select case when new.num > 1 then 1 end;
+end'''
+        self.assertEqual([trigger, 'select 4'], sql_utils.split_statements(trigger + ';\nselect 4;', 'sqlite'))
+
+    def test_execute_params(self):
+        self.populate_file('main.yaml', '''---
+                steps:
+                    - sqlite:
+                        actions:
+                            - request:
+                                conf: '/{0}'
+                                sql: 'insert into test(id, num) values(:id, :num)'
+                                params:
+                                    - {{id: 3, num: 3}}
+                                    - {{id: 4, num: 4}}
+                            - request:
+                                conf: '/{0}'
+                                sql: 'select num from test where id = :id'
+                                params: {{id: 4}}
+                              register: {{num: '{{{{ OUTPUT.num }}}}'}}
+                    - check:
+                        equals: {{the: '{{{{ num }}}}', is: 4}}
+                '''.format(join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertEqual([(1, 1), (2, 2), (3, 3), (4, 4)], self.get_values('test'))
+
+    def test_execute_async(self):
+        self.populate_file('main.yaml', '''---
+                variables:
+                    db_conf: {{url: '/{}', async: true}}
+                steps:
+                    - sqlite:
+                        request:
+                            conf: '{{{{ db_conf }}}}'
+                            sql:
+                                - 'select count(*) as count from test'
+                                - 'select num from test where id = 2'
+                        register: {{count: '{{{{ OUTPUT[0].count }}}}', num: '{{{{ OUTPUT[1].num }}}}'}}
+                    - check:
+                        equals: {{the: '{{{{ count }}}}', is: 2}}
+                    - check:
+                        equals: {{the: '{{{{ num }}}}', is: 2}}
+                '''.format(join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertEqual(1, len(db_utils._async_engines))
+        async_utils.stop()
+        self.assertEqual({}, db_utils._async_engines)
+
+    def test_snapshot_restore(self):
+        conf = '/' + join(self.test_dir, "test.db")
+        self.populate_file('main.yaml', '''---
+                steps:
+                    - sqlite:
+                        actions:
+                            - request:
+                                conf: '{0}'
+                                snapshot: seeded
+                            - request:
+                                conf: '{0}'
+                                sql: 'delete from test'
+                            - request:
+                                conf: '{0}'
+                                sql: 'create table other(id integer)'
+                            - request:
+                                conf: '{0}'
+                                restore: seeded
+                '''.format(conf))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertEqual([(1, 1), (2, 2)], self.get_values('test'))
+        with self.connection as conn:
+            tables = conn.execute("select name from sqlite_master where type = 'table'").fetchall()
+        self.assertEqual([('test',)], tables)
+
+    def test_expect_schema(self):
+        self.populate_file('resources/schema.json', '''{"test": {"columns": {"id": "serial", "num": "integer"},
+                                                                 "keys": ["id"]}}''')
+        self.populate_file('main.yaml', '''---
+                                    steps:
+                                        - expect:
+                                            compare:
+                                                sqlite:
+                                                    conf: '/{}'
+                                                    schema: schema.json
+                                    '''.format(join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
+    def test_expect_schema_mismatch(self):
+        self.populate_file('resources/schema.json', '''{"test": {"columns": {"id": "varchar", "name": "text"},
+                                                                 "keys": ["id", "num"]},
+                                                        "other": {"columns": {"id": "integer"}}}''')
+        with self.assertRaises(SchemaMismatchException) as error:
+            SQLite(sqlite={}).expect({'RESOURCES_DIR': join(self.test_dir, 'resources')},
+                                     conf='/' + join(self.test_dir, "test.db"), schema='schema.json')
+        self.assertEqual({'missing_tables': ['other'],
+                          'missing_columns': [{'table': 'test', 'column': 'name'}],
+                          'mismatched': [{'table': 'test', 'column': 'id', 'expected': 'varchar', 'actual': 'integer'}],
+                          'keys': [{'table': 'test', 'expected': ['id', 'num'], 'actual': ['id']}]},
+                         error.exception.diff)
+
+    def test_expect_strict_any_order(self):
+        self.populate_file('resources/test.csv', "id,num\n"
+                                                 "2,2\n"
+                                                 "1,1\n")
+        db_file = join(self.test_dir, "test.db")
+        variables = {'RESOURCES_DIR': join(self.test_dir, 'resources')}
+        SQLite(sqlite={}).expect(variables, conf='/' + db_file, data={'test': 'test.csv'}, strict=True)
+        self.populate_file('resources/test.csv', "id,num\n"
+                                                 "2,2\n"
+                                                 "3,3\n"
+                                                 "3,3\n")
+        with self.assertRaises(DataMismatchException) as error:
+            SQLite(sqlite={}).expect(variables, conf='/' + db_file, data={'test': 'test.csv'}, strict=True)
+        self.assertEqual([{'row': {'id': '3', 'num': '3'}, 'count': 2}], error.exception.diff['missing'])
+        self.assertEqual([{'row': {'id': '1', 'num': '1'}, 'count': 1}], error.exception.diff['extra'])
+
+    def test_expect_checksum_fallback(self):
+        self.populate_file('resources/test.csv', "id,num\n"
+                                                 "1,1\n"
+                                                 "2,3\n")
+        db_file = join(self.test_dir, "test.db")
+        with self.assertRaises(DataMismatchException) as error:
+            SQLite(sqlite={}).expect({'RESOURCES_DIR': join(self.test_dir, 'resources')},
+                                     conf='/' + db_file, data={'test': 'test.csv'}, checksum={'key': 'id'})
+        self.assertEqual([{'row': {'id': '2', 'num': '3'}, 'count': 1}], error.exception.diff['missing'])
+
+    def test_populate_templates(self):
+        self.populate_schema_file()
+        self.populate_file('resources/foo.csv', "user_id,email\n"
+                                                "{% for user in users %}"
+                                                "{{ loop.index }},{{ user }}\n"
+                                                "{% endfor %}\n"
+                                                "4,other_email\n")
+        self.populate_file('resources/bar.csv', "user_id,email\n"
+                                                "\n"
+                                                "1,{{ users[0] }}\n"
+                                                "2,{{ users[1] }}\n")
+        self.populate_file('main.yaml', '''---
+                            variables:
+                                users: ['test_1', 'test_2', 'test_3']
+                            steps:
+                                - prepare:
+                                    populate:
+                                        sqlite:
+                                            conf: '/{}'
+                                            schema: schema.sql
+                                            data:
+                                                foo: foo.csv
+                                - expect:
+                                    compare:
+                                        sqlite:
+                                            conf: '/{}'
+                                            data:
+                                                foo: bar.csv
+                            '''.format(join(self.test_dir, "test.db"), join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertEqual([(1, 'test_1'), (2, 'test_2'), (3, 'test_3'), (4, 'other_email')], self.get_values('foo'))
+
+    def test_populate_foreign_keys(self):
+        with self.connection as conn:
+            conn.executescript('''
+            CREATE TABLE users(
+                user_id      integer    primary key,
+                email        varchar(36)    NOT NULL
+            );
+            CREATE TABLE orders(
+                order_id     integer    primary key,
+                user_id      integer    NOT NULL REFERENCES users(user_id)
+            );
+            ''')
+        self.populate_file('resources/users.csv', "user_id,email\n"
+                                                  "1,test1@test.com\n")
+        self.populate_file('resources/orders.csv', "order_id,user_id\n"
+                                                   "1,1\n")
+        self.populate_file('main.yaml', '''---
+                            steps:
+                                - prepare:
+                                    populate:
+                                        sqlite:
+                                            conf: '/{}'
+                                            data:
+                                                orders: orders.csv
+                                                users: users.csv
+                            '''.format(join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertEqual([(1, 1)], self.get_values('orders'))
+        engine = db_utils.get_engine('/' + join(self.test_dir, "test.db"), 'sqlite')
+        self.assertEqual([['users', 'test'], ['orders']],
+                         SQLite(sqlite={})._SqlAlchemyDb__populate_order(engine, ['orders', 'users', 'test']))
+
+    def test_populate_cache(self):
+        self.populate_schema_file()
+        self.populate_data_file()
+        variables = {'RESOURCES_DIR': join(self.test_dir, 'resources')}
+        conf = '/' + join(self.test_dir, "test.db")
+        SQLite(sqlite={}).populate(variables, conf=conf, schema='schema.sql', data={'foo': 'foo.csv'}, cache=True)
+        with self.connection as conn:
+            conn.execute("update foo set email = 'changed' where user_id = 1")
+        # nothing changed - populate is skipped
+        SQLite(sqlite={}).populate(variables, conf=conf, schema='schema.sql', data={'foo': 'foo.csv'}, cache=True)
+        self.assertEqual([(1, 'changed'), (2, 'test2@test.com')], self.get_values('foo'))
+        # data changed - table is populated again
+        self.populate_file('resources/foo.csv', "user_id,email\n"
+                                                "1,test1@test.com\n")
+        SQLite(sqlite={}).populate(variables, conf=conf, schema='schema.sql', data={'foo': 'foo.csv'}, cache=True)
+        self.assertEqual([(1, 'test1@test.com')], self.get_values('foo'))
+        # load options changed - table is populated again
+        with self.connection as conn:
+            conn.execute("update foo set email = 'changed' where user_id = 1")
+        SQLite(sqlite={}).populate(variables, conf=conf, schema='schema.sql', data={'foo': 'foo.csv'}, cache=True,
+                                   use_json=True)
+        self.assertEqual([(1, 'test1@test.com')], self.get_values('foo'))
+        # schema, which drops the cache table
+        self.populate_file('resources/schema.sql', "drop table if exists catcher_populate_cache;\n"
+                                                   "drop table foo;\n"
+                                                   "create table foo(user_id integer primary key, email text);\n")
+        SQLite(sqlite={}).populate(variables, conf=conf, schema='schema.sql', data={'foo': 'foo.csv'}, cache=True,
+                                   script=True)
+        self.assertEqual([(1, 'test1@test.com')], self.get_values('foo'))
+
+    def test_populate_workers(self):
+        self.populate_schema_file()
+        self.populate_data_file()
+        self.populate_file('main.yaml', '''---
+                            steps:
+                                - prepare:
+                                    populate:
+                                        workers: 2
+                                        sqlite:
+                                            conf: '/{}'
+                                            schema: schema.sql
+                                            data:
+                                                foo: foo.csv
+                                - expect:
+                                    compare:
+                                        workers: 2
+                                        sqlite:
+                                            conf: '/{}'
+                                            data:
+                                                foo: foo.csv
+                            '''.format(join(self.test_dir, "test.db"), join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+
+    def test_populate_no_workers(self):
+        self.populate_schema_file()
+        self.populate_data_file()
+        SQLite(sqlite={}).populate({'RESOURCES_DIR': join(self.test_dir, 'resources')},
+                                   conf='/' + join(self.test_dir, "test.db"), schema='schema.sql',
+                                   data={'foo': 'foo.csv'}, workers=0)
+        self.assertEqual(2, len(self.get_values('foo')))
+
+    def test_find_service(self):
+        import catcher_modules.database
+        self.assertIs(SQLite, module_utils.find_service(catcher_modules.database, 'sqlite'))
+        self.assertIsNone(module_utils.find_service(catcher_modules.database, 'unknown'))
+
+    def test_read_to_file(self):
+        self.populate_file('main.yaml', '''---
+                steps:
+                    - sqlite:
+                        request:
+                            conf: '/{}'
+                            sql: 'select * from test order by id'
+                            to_file: 'test.csv'
+                        register: {{count: '{{{{ OUTPUT.count }}}}'}}
+                    - check:
+                        equals: {{the: '{{{{ count }}}}', is: 2}}
+                    - sqlite:
+                        request:
+                            conf: '/{}'
+                            sql: 'select * from test order by id'
+                            limit: 1
+                        register: {{first: '{{{{ OUTPUT }}}}'}}
+                    - check:
+                        equals: {{the: '{{{{ first }}}}', is: [{{id: 1, num: 1}}]}}
+                '''.format(join(self.test_dir, "test.db"), join(self.test_dir, "test.db")))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertTrue(check_file(join(self.test_dir, 'resources', 'test.csv'), 'id,num\n1,1\n2,2\n'))
+
+    def test_query_to_generator_releases_connection(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import QueuePool
+        engine = create_engine('sqlite:///' + join(self.test_dir, "test.db"), poolclass=QueuePool)
+        rows = generator_utils.query_to_generator('select * from test', engine)
+        self.assertEqual((1, 1), tuple(next(rows)))
+        self.assertEqual(1, engine.pool.checkedout())
+        rows.close()
+        self.assertEqual(0, engine.pool.checkedout())
+        engine.dispose()
+
+    def test_write_parquet_types_change_between_batches(self):
+        import pyarrow.parquet as pq
+        path = join(self.test_dir, 'resources', 'test.parquet')
+        rows = [{'id': 1, 'price': None}, {'id': 2, 'price': 1}, {'id': 3, 'price': 1.5}]
+        self.assertEqual(3, dataset_utils.write_rows(path, rows, batch_size=1))
+        table = pq.read_table(path)
+        self.assertEqual('double', str(table.schema.field('price').type))
+        self.assertEqual(rows, table.to_pylist())
+
+    def test_populate_parquet(self):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+        self.populate_schema_file()
+        data = pa.table({'user_id': [1, 2], 'email': ['test1@test.com', 'test2@test.com']})
+        pq.write_table(data, join(self.test_dir, 'resources', 'foo.parquet'))
+        feather.write_feather(data, join(self.test_dir, 'resources', 'foo.arrow'))
+        db_file = join(self.test_dir, "test.db")
+        self.populate_file('main.yaml', '''---
+                            steps:
+                                - prepare:
+                                    populate:
+                                        sqlite:
+                                            conf: '/{}'
+                                            schema: schema.sql
+                                            data:
+                                                foo: foo.parquet
+                                - expect:
+                                    compare:
+                                        sqlite:
+                                            conf: '/{}'
+                                            data:
+                                                foo: foo.arrow
+                                            strict: true
+                            '''.format(db_file, db_file))
+        runner = Runner(self.test_dir, join(self.test_dir, 'main.yaml'), None)
+        self.assertTrue(runner.run_tests())
+        self.assertEqual([(1, 'test1@test.com'), (2, 'test2@test.com')], self.get_values('foo'))